@@ -0,0 +1,79 @@
+"""This module grades individual EIB readings against the pass/fail
+limits in station_config.py."""
+
+from station_config import OUTx_PSC_FAIL_THRES_OFF, \
+    INx_PSC_FAIL_THRES_OFF, OUTx_PSC_FAIL_THRES_ON, INx_PSC_FAIL_THRES_ON, \
+    PS_24V_FAIL_THRES, GUARD_BAND_V, GUARD_BAND_REL, PASSTHROUGH_CHANNEL, \
+    PLC_INPUT_TAGS
+
+
+# Current limits by name; regrade.py grades against candidate copies
+LIMITS = {
+    "OUTx_PSC_FAIL_THRES_OFF": OUTx_PSC_FAIL_THRES_OFF,
+    "INx_PSC_FAIL_THRES_OFF": INx_PSC_FAIL_THRES_OFF,
+    "OUTx_PSC_FAIL_THRES_ON": OUTx_PSC_FAIL_THRES_ON,
+    "INx_PSC_FAIL_THRES_ON": INx_PSC_FAIL_THRES_ON,
+    "PS_24V_FAIL_THRES": PS_24V_FAIL_THRES,
+}
+
+
+def reading_limit_name(chan, state):
+    """Return (limit name in LIMITS, at_least) for a single reading: the
+    reading passes if it is >= the limit when at_least, else <= the limit.
+    state is "OFF" or "ON"."""
+    if chan == PASSTHROUGH_CHANNEL:
+        # If 24V PS Passthrough is >= 23V
+        return "PS_24V_FAIL_THRES", True
+    if chan < 4:
+        if state == "OFF":
+            # For J1-6 to J1-9 OFF, TB1-1, 5 TB2-1, 5 should be >=4.5V
+            return "OUTx_PSC_FAIL_THRES_OFF", True
+        # For J1-6 to J1-9 ON, TB1-1, 5 TB2-1, 5 should be SHORTED (Near 0V)
+        return "OUTx_PSC_FAIL_THRES_ON", False
+    if state == "OFF":
+        # For TB1-3, 7, TB2-3, 7 OFF, RD1-4 should be 0V - 4k4 pulldown!
+        return "INx_PSC_FAIL_THRES_OFF", False
+    return "INx_PSC_FAIL_THRES_ON", True
+
+
+def reading_limit(chan, state, limits=None):
+    """Return (limit, at_least) for a single reading, from limits (a
+    mapping like LIMITS; default the current limits)"""
+    name, at_least = reading_limit_name(chan, state)
+    return (LIMITS if limits is None else limits)[name], at_least
+
+
+def grade_reading(chan, state, voltage):
+    """Pass/fail for a single reading. state is "OFF" or "ON"."""
+    if voltage is None:
+        return False  # DMM read error
+    limit, at_least = reading_limit(chan, state)
+    return voltage >= limit if at_least else voltage <= limit
+
+
+def near_limit(chan, state, voltage):
+    """True if a fast reading is within the guard band of its limit and
+    must be re-measured precisely before it is graded"""
+    if voltage is None:
+        return True  # Retry a failed read
+    limit, _ = reading_limit(chan, state)
+    return abs(voltage - limit) <= max(GUARD_BAND_V,
+                                       abs(limit) * GUARD_BAND_REL)
+
+
+def readback_mismatches(chan, state, reads, tags=None, input_tags=None):
+    """PLC tags read during a channel's OFF/ON step that do not match its
+    drive state. reads is [(tag, value, status), ...]. tags is the
+    channel's (input drive, DMM relay) tag pair and input_tags its board's
+    PLC input tags, for boards on other slots of a multi-up fixture."""
+    drive, relay = tags or (f"DO1_{chan}", f"DO2_{chan}")
+    input_tags = PLC_INPUT_TAGS if input_tags is None else input_tags
+    values = {tag: (value, tag_status) for tag, value, tag_status in reads}
+    expected = {drive: state == "ON" and chan != PASSTHROUGH_CHANNEL,
+                relay: True}
+    if chan in input_tags:
+        # IN(1-4)-PSC drives IB16-(0-3) when the channel is ON
+        expected[input_tags[chan]] = state == "ON"
+    return [tag for tag, want in expected.items()
+            if tag not in values or values[tag][1] != "Success"
+            or bool(values[tag][0]) != want]
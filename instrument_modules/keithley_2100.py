@@ -9,20 +9,34 @@ NSLS-II Diagnostics and Instrumentation
 
 from time import sleep
 from instrument_modules.visa_utils import connect_usb_instrument
+from instrument_modules.meter import Meter
+from instrument_modules.traffic_trace import RecordingDevice, ReplayDevice
 
 DELAY = 0.01  # 10ms delay
 
+# Integration profiles, as the MEASure resolution argument: MAX is the
+# coarsest resolution (shortest integration), MIN the finest (longest)
+MEAS_PROFILES = {"fast": "MAX", "normal": "DEF", "precise": "MIN"}
 
-class Keithley2100:
-    """Create Signal Generator Class"""
+
+class Keithley2100(Meter):
+    """Create Keithley 2100 DMM Class"""
     # *************************************************************************
     # ******Initialize Connection******
     # Keithely 2100s are USB Only. Ethernet connection method omitted.
-    def __init__(self, connection_method, address):
+    # With a TraceWriter, USB traffic is recorded; "REPLAY" serves the
+    # responses recorded for this address from a TraceReader instead.
+    def __init__(self, connection_method, address, trace=None):
         if connection_method == "USB":
             self.device, self.address, self.status = \
                 connect_usb_instrument(address)
             self.connected_with = 'USB' if self.status == "Connected" else None
+            if trace is not None and self.device is not None:
+                self.device = RecordingDevice(self.device, trace, address)
+        elif connection_method == "REPLAY":
+            self.device = ReplayDevice(trace, address)
+            self.address, self.status = address, "Connected"
+            self.connected_with = 'REPLAY'
 
     # *************************************************************************
     # ******Factory Reset******
@@ -35,8 +49,11 @@ class Keithley2100:
     # *************************************************************************
     # MEASure COMMAND SET
 
-    def meas_dcv(self, meas_range="100", resolution="DEF"):
-        """Measure DC Volts"""
+    def meas_dcv(self, meas_range="100", resolution="DEF", profile=None):
+        """Measure DC Volts. profile ("fast", "normal" or "precise")
+        overrides resolution."""
+        if profile is not None:
+            resolution = MEAS_PROFILES[profile]
         command = f"MEASURE:VOLTAGE:DC? {meas_range},{resolution}"
         try:
             dcv = float(self.device.query(command))
@@ -0,0 +1,68 @@
+"""This module defines the Meter interface implemented by DMM drivers,
+and the AsyncMeter version used to read several meters at once."""
+
+import asyncio
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+
+class Meter(ABC):
+    """Synchronous measuring instrument"""
+
+    @abstractmethod
+    def meas_dcv(self, meas_range="100", resolution="DEF", profile=None):
+        """Measure DC Volts. Return float, or None on error. profile is
+        one of "fast", "normal" or "precise" and overrides resolution."""
+
+    @abstractmethod
+    def meas_res(self, meas_range="100", resolution="DEF"):
+        """Measure resistance. Return float, or None on error."""
+
+    def as_async(self):
+        """Return an asyncio view of this meter"""
+        return AsyncMeterAdapter(self)
+
+
+class AsyncMeter(ABC):
+    """Asyncio measuring instrument"""
+
+    @abstractmethod
+    async def meas_dcv(self, meas_range="100", resolution="DEF",
+                       profile=None):
+        """Measure DC Volts. Return float, or None on error. profile is
+        one of "fast", "normal" or "precise" and overrides resolution."""
+
+    @abstractmethod
+    async def meas_res(self, meas_range="100", resolution="DEF"):
+        """Measure resistance. Return float, or None on error."""
+
+    def close(self):
+        """Release any resources held by the async wrapper"""
+
+
+class AsyncMeterAdapter(AsyncMeter):
+    """Run a synchronous Meter's blocking calls in a worker thread.
+
+    Each adapter owns a single worker thread, so calls to one meter are
+    serialized (a VISA session must not be used from two threads at once)
+    while calls to different meters run in parallel."""
+
+    def __init__(self, meter):
+        self.meter = meter
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    async def _call(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(func, *args))
+
+    async def meas_dcv(self, meas_range="100", resolution="DEF",
+                       profile=None):
+        return await self._call(self.meter.meas_dcv, meas_range, resolution,
+                                profile)
+
+    async def meas_res(self, meas_range="100", resolution="DEF"):
+        return await self._call(self.meter.meas_res, meas_range, resolution)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
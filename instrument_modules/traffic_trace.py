@@ -0,0 +1,300 @@
+"""This module records PLC and DMM traffic to a gzip JSON-lines trace
+and replays it, recorded exceptions included, in place of the hardware."""
+
+import builtins
+import gzip
+import json
+import threading
+from collections import deque
+from datetime import datetime
+from time import monotonic, sleep
+
+PLC_SOURCE = "plc"
+
+
+class ReplayMismatchError(Exception):
+    """The code under replay made a call the trace did not record"""
+
+
+class RecordedError(Exception):
+    """An exception a traced call raised while recording, raised again on
+    replay when its type is not a built-in exception. type_name is the
+    original exception's class name."""
+
+    def __init__(self, type_name, message):
+        super().__init__(f"{type_name}: {message}")
+        self.type_name = type_name
+
+
+def _replayed_error(exc):
+    """Rebuild a recorded exception, as its own type if it is built in"""
+    error_type = getattr(builtins, exc["type"], None)
+    if isinstance(error_type, type) and issubclass(error_type, Exception):
+        return error_type(exc["message"])
+    return RecordedError(exc["type"], exc["message"])
+
+
+class TraceResponse:
+    """Stand-in for a pylogix Response"""
+
+    def __init__(self, TagName, Value, Status):  # pylint: disable=C0103
+        self.TagName = TagName
+        self.Value = Value
+        self.Status = Status
+
+    def __repr__(self):
+        return f"TraceResponse({self.TagName}, {self.Value}, {self.Status})"
+
+
+def _normalize(value):
+    """Round-trip through JSON so tuples and lists compare equal"""
+    return json.loads(json.dumps(value))
+
+
+# *************************************************************************
+# ******Recording******
+
+
+class TraceWriter:
+    """Collect traced calls and write them to a gzip JSON-lines file.
+    Calls made before open() are buffered and written when it is called."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._file = None
+        self._buffer = []
+        self._t0 = monotonic()
+
+    def open(self, path, **meta):
+        """Start writing to path, with meta saved in the header line"""
+        with self._lock:
+            self._file = gzip.open(path, mode='wt', encoding='utf-8')
+            header = {"header": {"created": datetime.now().isoformat(
+                timespec="seconds"), **meta}}
+            self._file.write(json.dumps(header) + "\n")
+            for line in self._buffer:
+                self._file.write(line)
+            self._buffer = []
+        print(f"Recording instrument traffic to: {path}")
+
+    def _write(self, event):
+        line = json.dumps(event) + "\n"
+        with self._lock:
+            if self._file is None:
+                self._buffer.append(line)
+            else:
+                self._file.write(line)
+
+    def record(self, source, op, request, response, start, end,
+               error=None):
+        """Log one call, and the exception it raised if it failed"""
+        event = {"t": round(start - self._t0, 6),
+                 "dt": round(end - start, 6), "src": source, "op": op,
+                 "req": request, "resp": response}
+        if error is not None:
+            event["exc"] = {"type": type(error).__name__,
+                            "message": str(error)}
+        self._write(event)
+
+    def mark(self, label):
+        """Log a named point in the sequence (e.g. the start of io_test)"""
+        self._write({"t": round(monotonic() - self._t0, 6), "mark": label})
+
+    def close(self):
+        """Finish the trace file"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def _traced(trace, source, op, request, call, encode=None):
+    """Make one call and record it, including any exception it raises"""
+    start = monotonic()
+    try:
+        result = call()
+    except Exception as e:
+        trace.record(source, op, request, None, start, monotonic(), error=e)
+        raise
+    trace.record(source, op, request,
+                 result if encode is None else encode(result), start,
+                 monotonic())
+    return result
+
+
+def _plc_request(tag, value=None):
+    if isinstance(tag, list):
+        return {"multi": True, "tags": _normalize(tag)}
+    return {"multi": False, "tags": _normalize(tag), "value": value}
+
+
+def _plc_response(response):
+    if isinstance(response, list):
+        return [[r.TagName, r.Value, r.Status] for r in response]
+    return [response.TagName, response.Value, response.Status]
+
+
+class RecordingPLC:
+    """pylogix PLC wrapper that traces every Read and Write"""
+
+    def __init__(self, plc, trace):
+        self._plc = plc
+        self._trace = trace
+
+    def __getattr__(self, name):
+        return getattr(self._plc, name)
+
+    def Read(self, tag, count=1, datatype=None):  # pylint: disable=C0103
+        """Traced pylogix Read"""
+        return _traced(self._trace, PLC_SOURCE, "Read", _plc_request(tag),
+                       lambda: self._plc.Read(tag, count, datatype),
+                       _plc_response)
+
+    def Write(self, tag, value=None, datatype=None):  # pylint: disable=C0103
+        """Traced pylogix Write"""
+        return _traced(self._trace, PLC_SOURCE, "Write",
+                       _plc_request(tag, value),
+                       lambda: self._plc.Write(tag, value, datatype),
+                       _plc_response)
+
+    def Close(self):  # pylint: disable=C0103
+        """Close the PLC connection"""
+        self._plc.Close()
+
+
+class RecordingDevice:
+    """PyVISA resource wrapper that traces every write and query"""
+
+    def __init__(self, device, trace, source):
+        self._device = device
+        self._trace = trace
+        self._source = source
+
+    def __getattr__(self, name):
+        return getattr(self._device, name)
+
+    def write(self, command):
+        """Traced VISA write"""
+        return _traced(self._trace, self._source, "write", command,
+                       lambda: self._device.write(command))
+
+    def query(self, command):
+        """Traced VISA query"""
+        return _traced(self._trace, self._source, "query", command,
+                       lambda: self._device.query(command))
+# *************************************************************************
+
+# *************************************************************************
+# ******Replay******
+
+
+class TraceReader:
+    """Serve recorded calls back in order, per source.
+
+    speed scales the recorded call durations: 1 is real time, 10 is ten
+    times faster, 0 returns immediately. With start_mark/end_mark, only the
+    calls recorded between those marks are replayed. With strict, a call
+    that does not match the trace raises ReplayMismatchError; otherwise it
+    is reported and the recorded response returned anyway. A call that
+    raised while recording raises again (see RecordedError)."""
+
+    def __init__(self, path, speed=1.0, start_mark=None, end_mark=None,
+                 strict=False):
+        self.path = path
+        self.speed = speed
+        self.strict = strict
+        self.header = {}
+        self.mismatches = []
+        self._lock = threading.Lock()
+        self._events = {}
+        started = start_mark is None
+        with gzip.open(path, mode='rt', encoding='utf-8') as file:
+            for line in file:
+                event = json.loads(line)
+                if "header" in event:
+                    self.header = event["header"]
+                elif "mark" in event:
+                    if started and event["mark"] == end_mark:
+                        break
+                    started = started or event["mark"] == start_mark
+                elif started:
+                    self._events.setdefault(event["src"], deque()).append(
+                        event)
+        if not started:
+            raise ValueError(f"{path} has no mark {start_mark!r}")
+
+    def next(self, source, op, request):
+        """Return the recorded response to the next call from source, or
+        raise the exception it recorded. Calls are matched to the earliest
+        pending event with the same op and request, since parallel lanes
+        share the PLC and do not interleave the same way every run."""
+        request = _normalize(request)
+        with self._lock:
+            queue = self._events.get(source)
+            if not queue:
+                raise ReplayMismatchError(
+                    f"{source}: {op} {request!r} made after the trace ended")
+            for index, event in enumerate(queue):
+                if event["op"] == op and event["req"] == request:
+                    del queue[index]
+                    break
+            else:
+                event = queue.popleft()
+                message = (f"{source}: no recorded {op} {request!r}, next "
+                           f"is {event['op']} {event['req']!r}")
+                self.mismatches.append(message)
+                if self.strict:
+                    raise ReplayMismatchError(message)
+                print(f"Replay mismatch: {message}")
+        if self.speed > 0:
+            sleep(event["dt"] / self.speed)
+        if "exc" in event:
+            raise _replayed_error(event["exc"])
+        return event["resp"]
+
+    def remaining(self):
+        """Number of recorded calls not yet replayed, per source"""
+        return {source: len(queue) for source, queue in self._events.items()
+                if queue}
+
+
+class ReplayPLC:
+    """Drop-in for a pylogix PLC that serves responses from a trace"""
+
+    def __init__(self, trace):
+        self._trace = trace
+        self.IPAddress = None  # pylint: disable=C0103
+
+    def _replay(self, op, tag, value=None):
+        response = self._trace.next(PLC_SOURCE, op, _plc_request(tag, value))
+        if isinstance(tag, list):
+            return [TraceResponse(*item) for item in response]
+        return TraceResponse(*response)
+
+    def Read(self, tag, count=1, datatype=None):  # pylint: disable=C0103
+        """Replayed pylogix Read"""
+        return self._replay("Read", tag)
+
+    def Write(self, tag, value=None, datatype=None):  # pylint: disable=C0103
+        """Replayed pylogix Write"""
+        return self._replay("Write", tag, value)
+
+    def Close(self):  # pylint: disable=C0103
+        """Nothing to close when replaying"""
+
+
+class ReplayDevice:
+    """Drop-in for a PyVISA resource that serves responses from a trace"""
+
+    def __init__(self, trace, source):
+        self._trace = trace
+        self._source = source
+
+    def write(self, command):
+        """Replayed VISA write"""
+        return self._trace.next(self._source, "write", command)
+
+    def query(self, command):
+        """Replayed VISA query"""
+        return self._trace.next(self._source, "query", command)
+# *************************************************************************
@@ -6,33 +6,39 @@ M. Capotosto
 NSLS-II Diagnostics and Instrumentation"""
 
 import csv
+import shutil
 import sys
 import os
 from datetime import datetime
-from time import sleep
+from time import monotonic, sleep
 from pylogix import PLC
+from grading import grade_reading, near_limit, readback_mismatches
 from report_generator import plot_pdf
+from sequence_engine import PanelLayout, SequenceEngine
+from settle_calibration import SettleProfile
+from station_config import PLC_IP_ADDRESS, DMM_ADDRESSES, PANEL_SLOTS, \
+    PLC_READBACK_ENABLED, TWO_SPEED_MEASUREMENT, STATION_ID, \
+    STATUS_SERVER_ENABLED, STATUS_SERVER_PORT, STATUS_HISTORY_LEN, \
+    TRACE_RECORD
+from status_server import StatusPublisher
 from instrument_modules.keithley_2100 import Keithley2100
+from instrument_modules.traffic_trace import TraceWriter, RecordingPLC
 
 
-OUTx_PSC_FAIL_THRES_OFF = 4.5  # Make sure output is >4.5V
-INx_PSC_FAIL_THRES_OFF = 0.2  # Make sure output is <100mV
-
-OUTx_PSC_FAIL_THRES_ON = 0.3  # Make sure output is <= 300mV
-INx_PSC_FAIL_THRES_ON = 18  # Make sure input is >15VDC
-
-# *************************************************************************
-# ******Set Insturment IP Addresses******
-
-PLC_IP_ADDRESS = "10.0.142.100"  # Set PLC IP Address here
-DMM_ADDRESS = "USB0::0x05E6::0x2100::8020356::INSTR"
-# *************************************************************************
-
 # *************************************************************************
 # ******Create Instrument Objects******
+trace = TraceWriter() if TRACE_RECORD else None  # See replay_trace.py
 plc = PLC()
-plc.IPAddress = '10.0.142.100'
-dmm = Keithley2100(connection_method="USB", address=DMM_ADDRESS)
+plc.IPAddress = PLC_IP_ADDRESS
+if trace is not None:
+    plc = RecordingPLC(plc, trace)
+dmms = [Keithley2100(connection_method="USB", address=address,
+                     trace=trace) for address in DMM_ADDRESSES]
+status = StatusPublisher(STATION_ID, port=STATUS_SERVER_PORT,
+                         history_len=STATUS_HISTORY_LEN,
+                         enabled=STATUS_SERVER_ENABLED)
+settle = SettleProfile.load()  # Measured per-channel settle delays
+panel = PanelLayout(PANEL_SLOTS)  # EIB positions on the fixture
 # *************************************************************************
 
 # *************************************************************************
@@ -87,8 +93,9 @@ def get_test_tech_info():
             return tester_name, tester_life
 
 
-def save_test_tech_info():
-    """Save test technician demographics to file"""
+def save_test_tech_info(raw_data_path, EIB_sn, panel_id, panel_boards):
+    """Save test technician demographics, and the panel the board was
+    tested on (for throughput_report.py), to file"""
     # **********************************************************************************
     # Save test data to file...
     # **********************************************************************************
@@ -96,8 +103,9 @@ def save_test_tech_info():
     file_path_l = os.path.join(raw_data_path, f"{EIB_sn}_Technician_Data.csv")
 
     data = [
-        ["tester_name", "tester_life"],
-        [tester_name, tester_life]
+        ["tester_name", "tester_life", "station_id", "panel_id",
+         "panel_boards"],
+        [tester_name, tester_life, STATION_ID, panel_id, panel_boards]
     ]
 
     try:
@@ -116,10 +124,12 @@ def save_test_tech_info():
         print(f"Error writing to {file_path_l}: {e}")
 
 
-def get_EIB_info():
-    """Acquire eib Serial No./Type Information"""
+def get_EIB_info(slot=None):
+    """Acquire eib Serial No./Type Information, for the EIB in the given
+    slot of a multi-up fixture"""
+    where = "" if slot is None else f" in slot {slot + 1}"
     while True:
-        EIB_sn = input("Enter EIB S/N: ")
+        EIB_sn = input(f"Enter EIB S/N{where}: ")
         if input(f"You entered: {EIB_sn}, is this correct? <Y/N>: ") \
                 in ("Y", "y"):
             dir_create_time, dir_time_formatted, report_date_formatted, \
@@ -181,6 +191,59 @@ def save_EIB_test_data(io_voltage_op_off, io_voltage_op_on, Visual_LED_PassFail,
         print(f"Error writing to {file_path}: {e}")
 # *************************************************************************
 
+
+def save_plc_readback(plc_readback, raw_data_path, EIB_sn):
+    """Save every PLC tag read back during the I/O test, and any failed
+    writes, to file"""
+    file_path = os.path.join(raw_data_path, f"{EIB_sn}_PLC_Readback.csv")
+
+    try:
+        with open(file_path, mode='w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(["Channel", "State", "Tag", "Value", "Status"])
+            for (chan, state), reads in sorted(plc_readback["reads"].items()):
+                for tag, value, tag_status in reads:
+                    writer.writerow([chan, state, tag, value, tag_status])
+            for tag, value, tag_status in plc_readback["write_errors"]:
+                writer.writerow(["", "WRITE", tag, value, tag_status])
+
+        print(f"PLC readback saved to: {file_path}")
+
+    except Exception as e:
+        print(f"Error writing to {file_path}: {e}")
+# *************************************************************************
+# ******Run Stage Timing (for throughput_report.py)******
+
+stage_log = []  # (stage name, monotonic start time) for the current run
+
+
+def mark_stage(name):
+    """Begin a named run stage, ending the previous one"""
+    status.step(name)
+    stage_log.append((name, monotonic()))
+
+
+def save_stage_timings(raw_data_path, EIB_sn):
+    """Save run stage start/end times, in seconds from the start of the
+    run, to file"""
+    file_path = os.path.join(raw_data_path, f"{EIB_sn}_Stage_Timings.csv")
+    run_t0 = stage_log[0][1]
+    ends = [start for _, start in stage_log[1:]] + [monotonic()]
+
+    try:
+        with open(file_path, mode='w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(["Stage", "Start (s)", "End (s)"])
+            for (name, start), end in zip(stage_log, ends):
+                writer.writerow([name, round(start - run_t0, 3),
+                                 round(end - run_t0, 3)])
+
+        print(f"Stage timings saved to: {file_path}")
+
+    except Exception as e:
+        print(f"Error writing to {file_path}: {e}")
+# *************************************************************************
+
 # **********************************************************************************
 # ******PLC Initialization******
 # **********************************************************************************
@@ -193,7 +256,13 @@ def plc_init():
     for chan in range(16):
         plc.Write(f"DO1_{chan}", 0)
         plc.Write(f"DO2_{chan}", 0)
-        sleep(0.5)
+    # Other slots of a multi-up fixture may use further output cards
+    cleared = {f"DO{bank}_{chan}" for bank in (1, 2) for chan in range(16)}
+    for tag in sorted(panel.output_tags() - cleared):
+        plc.Write(tag, 0)
+    # Wait once for the slowest input and DMM relay to release
+    sleep(max(settle.wave_delay(range(16), "reset"),
+              settle.wave_delay(range(16), "release")))
 # **********************************************************************************
 
 
@@ -216,98 +285,79 @@ def pwr_led_test():
         return False
 
 
-def io_test():
-    io_voltage_op_off = []  # Voltage with output OFF
-    io_voltage_op_on = []  # Voltage with output ON
-    chan = 0
-
-    # Loop through channels 0 to 7
-    for chan in range(8):
-
-        # Disable input and enable DMM for the channel
-        plc.Write(f"DO1_{chan}", 0)
-        plc.Write(f"DO2_{chan}", 1)
-        sleep(0.5)
-
-        # Take output OFF voltage measurement
-        io_voltage_op_off.append(round(dmm.meas_dcv(), 3))
-
-        # Enable input and DMM for the channel
-        plc.Write(f"DO1_{chan}", 1)
-        plc.Write(f"DO2_{chan}", 1)
-        sleep(0.5)
-
-        # Take output ON voltage measurement
-        voltage = dmm.meas_dcv()
-        sleep(0.2)
-        io_voltage_op_on.append(round(voltage, 3))
-        sleep(2)
-
-        # Disable input and DMM for the channel
-        plc.Write(f"DO1_{chan}", 0)
-        plc.Write(f"DO2_{chan}", 0)
-        sleep(0.5)
-
-    # Measure 24VDC passthrough on TB4 (channel 8)
-    chan = 8
-    plc.Write(f"DO1_{chan}", 0)
-    plc.Write(f"DO2_{chan}", 1)
-    sleep(0.5)
-    # Take output OFF voltage measurement
-    voltage = dmm.meas_dcv()
-    sleep(0.2)
-    io_voltage_op_on.append(round(voltage, 3))
-    io_voltage_op_off.append(0)
-
-    # Shut off the measurement relay output now...
-    plc.Write(f"DO2_{chan}", 0)
-    sleep(0.5)
-
-    return io_voltage_op_off, io_voltage_op_on
+def io_test(meters=None, timing_log_path=None):
+    """Run the I/O test for every EIB on the fixture on the deadline-based
+    sequence engine. Channels wired to different DMMs run in parallel
+    lanes. Returns [(OFF voltages, ON voltages, PLC readback or None), ...]
+    with one entry per panel slot."""
+    engine = SequenceEngine(
+        plc, meters if meters is not None else dmms, panel.channel_meter_map,
+        settle, status, grade_reading, timing_log_path,
+        panel.input_tags if PLC_READBACK_ENABLED else None,
+        near_limit if TWO_SPEED_MEASUREMENT else None,
+        tag_map=panel.tag_map)
+    engine.run()
+
+    results = []
+    for slot in range(len(panel.slots)):
+        points = panel.slot_points(slot)
+        io_voltage_op_off = [engine.voltage_off[point]
+                             for point in points.values()]
+        io_voltage_op_on = [engine.voltage_on[point]
+                            for point in points.values()]
+        plc_readback = None
+        if PLC_READBACK_ENABLED:
+            slot_tags = panel.output_tags(slot)
+            plc_readback = {
+                "reads": {(chan, state): engine.readback[(point, state)]
+                          for chan, point in points.items()
+                          for state in ("OFF", "ON")
+                          if (point, state) in engine.readback},
+                "write_errors": [error for error in engine.write_errors
+                                 if error[0] in slot_tags]}
+        results.append((io_voltage_op_off, io_voltage_op_on, plc_readback))
+
+    return results
 # *************************************************************************
 
 
 # **********************************************************************************
 # ******Pass/Fail Result tabulation******
 # **********************************************************************************
-def io_tabulate_results(io_voltage_op_off, io_voltage_op_on, Visual_LED_PassFail):
-    io_op_off_results = [False] * 8
-    io_op_on_results = [False] * 9
+def io_tabulate_results(io_voltage_op_off, io_voltage_op_on, Visual_LED_PassFail,
+                        plc_readback=None, slot=0):
     # Check output OFF Values
-    for i in range(4):
-        if io_voltage_op_off[i] >= OUTx_PSC_FAIL_THRES_OFF:
-            # For J1-6 to J1-9 OFF, TB1-1, 5 TB2-1, 5 should be >=4.5V
-            io_op_off_results[i] = True
-        else:
-            io_op_off_results[i] = False  # Failed!
-
-    for i in range(4, 8):
-        if io_voltage_op_off[i] <= INx_PSC_FAIL_THRES_OFF:
-            # For TB1-3, 7, TB2-3, 7 OFF, RD1-4 should be 0V - 4k4 pulldown!
-            io_op_off_results[i] = True
-        else:
-            io_op_off_results[i] = False  # Failed!
-
-    # Check output ON values
-    for i in range(4):
-        if io_voltage_op_on[i] <= OUTx_PSC_FAIL_THRES_ON:
-            # For J1-6 to J1-9 ON, TB1-1, 5 TB2-1, 5 should be SHORTED (Near 0V)
-            io_op_on_results[i] = True
-        else:
-            io_op_on_results[i] = False  # Failed!
-
-    for i in range(4, 8):
-        if io_voltage_op_on[i] >= INx_PSC_FAIL_THRES_ON:
-            io_op_on_results[i] = True
-        else:
-            io_op_on_results[i] = False  # Failed!
-
-    # Check 24V PSU
-    if io_voltage_op_on[8] >= 23:
-        # If 24V PS Passthrough is >= 23V
-        io_op_on_results[8] = True
-    else:
-        io_op_on_results[8] = False  # Fail!
+    io_op_off_results = [grade_reading(i, "OFF", io_voltage_op_off[i])
+                         for i in range(8)]
+    # Check output ON values, and the 24V PSU
+    io_op_on_results = [grade_reading(i, "ON", io_voltage_op_on[i])
+                        for i in range(9)]
+
+    # Check PLC readback: DO1/DO2 echo their commanded states and each
+    # IB16 input follows its channel
+    readback_data = {}
+    readback_passfail = True
+    if plc_readback is not None:
+        wiring = PANEL_SLOTS[slot]
+        steps = [(i, "OFF") for i in range(8)] + [(i, "ON") for i in range(9)]
+        mismatches = {step: readback_mismatches(
+            *step, plc_readback["reads"].get(step, []),
+            wiring["tags"][step[0]], wiring["inputs"]) for step in steps}
+        output_errors = len(plc_readback["write_errors"]) + sum(
+            tag not in wiring["inputs"].values()
+            for tags in mismatches.values() for tag in tags)
+        for chan, tag in wiring["inputs"].items():
+            for state in ("OFF", "ON"):
+                reads = {read[0]: read[1] for read in
+                         plc_readback["reads"].get((chan, state), [])}
+                value = "ON" if reads.get(tag) else "OFF" if tag in reads \
+                    else "No Data"
+                readback_data[f"IN{chan - 3}-PSC DI {state}"] = \
+                    (value, tag not in mismatches[(chan, state)])
+        readback_data["PLC_Outputs"] = \
+            ("OK" if output_errors == 0 else f"{output_errors} errors",
+             output_errors == 0)
+        readback_passfail = all(result for _, result in readback_data.values())
 
     # For Channnels 0 to 3:
     # OB16-0-3, TO OUT(1-4)-PSC
@@ -334,6 +384,7 @@ def io_tabulate_results(io_voltage_op_off, io_voltage_op_on, Visual_LED_PassFail
         all(io_op_on_results[:4]) and  # Check first 4 for ON values
         all(io_op_on_results[4:8]) and  # Check next 4 for ON values
         io_op_on_results[8]  and # Check 24V PSU test
+        readback_passfail and  # Check PLC digital readback
         Visual_LED_PassFail  # Check LEDs light sequentially and correctly. 
     )
 
@@ -358,6 +409,8 @@ def io_tabulate_results(io_voltage_op_off, io_voltage_op_on, Visual_LED_PassFail
 
         "24V_PS": (io_voltage_op_on[8], io_op_on_results[8]),
 
+        **readback_data,
+
         "Visual_LED": (Visual_LED_PassFail, Visual_LED_PassFail)
     }
     return overall_test_passfail, test_data
@@ -369,8 +422,9 @@ def io_tabulate_results(io_voltage_op_off, io_voltage_op_on, Visual_LED_PassFail
 
 
 def generate_report_dataset(EIB_sn, tester_name, tester_life,
-                            report_date_formatted, test_data,
-                            overall_test_passfail, Visual_LED_PassFail):
+                            report_date_formatted, report_time_formatted,
+                            test_data, overall_test_passfail,
+                            Visual_LED_PassFail):
     """Generate data dictionary for the report_generator.py module"""
     dut_info_l = {
         "Title": f"External Interface Board Test Results<br/>"
@@ -391,16 +445,35 @@ def generate_report_dataset(EIB_sn, tester_name, tester_life,
 # *************************************************************************
 
 
+status.start()  # Serve live station status if enabled
 tester_name, tester_life = get_test_tech_info()  # Get test technician info
 
-EIB_sn, dir_create_time, dir_time_formatted, report_date_formatted, \
-        report_time_formatted, report_path, raw_data_path \
-        = get_EIB_info()  # Get EIB S/N
+# One Test_Data run per EIB on the fixture. Record the time at the start
+# of the test for reporting, file naming purposes.
+boards = []
+for panel_slot in range(len(panel.slots)):
+    EIB_sn, dir_create_time, dir_time_formatted, report_date_formatted, \
+            report_time_formatted, report_path, raw_data_path \
+            = get_EIB_info(panel_slot if len(panel.slots) > 1 else None)
+    boards.append({"sn": EIB_sn, "report_date": report_date_formatted,
+                   "report_time": report_time_formatted,
+                   "report_path": report_path,
+                   "raw_data_path": raw_data_path})
+panel_sns = " + ".join(board["sn"] for board in boards)
+# Boards tested together share one cycle: name the panel after its first run
+panel_id = os.path.basename(os.path.dirname(boards[0]["raw_data_path"]))
 
-# Record the time at the start of the test for reporting, file \
-# naming purposes.
 print("Test data directories created...")
-save_test_tech_info()  # Save technician data to the new test directory...
+if trace is not None:
+    trace.open(os.path.join(boards[0]["raw_data_path"],
+                            f"{boards[0]['sn']}_Instrument_Trace.jsonl.gz"),
+               eib_sn=panel_sns, station_id=STATION_ID)
+status.run_started(panel_sns, tester_name)
+mark_stage("setup")
+for board in boards:
+    # Save technician data to the new test directories...
+    save_test_tech_info(board["raw_data_path"], board["sn"], panel_id,
+                        len(boards))
 print("Initialzing PLC...")
 plc_init()  # Initialize the PLC
 
@@ -408,42 +481,85 @@ plc_init()  # Initialize the PLC
 input("Ensure JP1, JP2, JP3, JP4, and F1 are installed as directed.")
 input("Ensure TB1-4, and J1 are connected.")
 input("Press return when ready for Power ON...")
+mark_stage("power_on")
 plc.Write('CR0', 1)  # Enable +24V, +5V PSUs
 sleep(0.5)
 pwr_led_test_result = pwr_led_test()
 # Initial power on test, check +24V and +5V LEDs
 
+mark_stage("operator_ready")
 input("When ready to begin, monitor LEDs for each channel. They should \
       illuminate in pairs - D3 and D7, then D2 and D11, and so on. They \
       will illuminate for 2 seconds each. Press return when ready to \
       continue.")
 
-io_voltage_op_off, io_voltage_op_on = io_test()  # I/O Test
+mark_stage("io_test")
+if trace is not None:
+    trace.mark("io_test")
+step_timings_path = os.path.join(boards[0]["raw_data_path"],
+                                 f"{boards[0]['sn']}_Step_Timings.csv")
+panel_results = io_test(timing_log_path=step_timings_path)  # I/O Test
+if trace is not None:
+    trace.mark("io_test_end")
 # Generate pass/fail results
+mark_stage("operator_led_check")
 LEDTest = input("Did all LEDs light properly and in sequence? <Y/N>")
-if LEDTest in ("Y", "y"):
-    Visual_LED_PassFail = True
-else:
-    Visual_LED_PassFail = False
-overall_test_passfail, test_data = io_tabulate_results(io_voltage_op_off, io_voltage_op_on, Visual_LED_PassFail)
-
-save_EIB_test_data(io_voltage_op_off, io_voltage_op_on, Visual_LED_PassFail, raw_data_path, EIB_sn)
-# Save test data to raw file
+led_failed_sns = set()
+if LEDTest not in ("Y", "y"):
+    led_failed_sns = {board["sn"] for board in boards}
+    if len(boards) > 1:
+        # Only the boards the operator names fail the visual check
+        named = input(f"Enter the S/N(s) that failed ({panel_sns}), "
+                      "separated by spaces, or press return for all: ")
+        led_failed_sns = set(named.split()) & led_failed_sns \
+            or led_failed_sns
+mark_stage("save")
+for panel_slot, (board, (io_voltage_op_off, io_voltage_op_on,
+                         plc_readback)) in enumerate(zip(boards,
+                                                         panel_results)):
+    board["visual_led"] = board["sn"] not in led_failed_sns
+    board["passfail"], board["test_data"] = io_tabulate_results(
+        io_voltage_op_off, io_voltage_op_on, board["visual_led"],
+        plc_readback, panel_slot)
+
+    save_EIB_test_data(io_voltage_op_off, io_voltage_op_on,
+                       board["visual_led"], board["raw_data_path"],
+                       board["sn"])
+    # Save test data to raw file
+    if plc_readback is not None:
+        save_plc_readback(plc_readback, board["raw_data_path"], board["sn"])
+    if panel_slot > 0:
+        # The panel's step timings are shared by every board on it
+        try:
+            shutil.copyfile(step_timings_path, os.path.join(
+                board["raw_data_path"], f"{board['sn']}_Step_Timings.csv"))
+        except Exception as e:
+            print(f"Error copying {step_timings_path}: {e}")
+status.run_finished(all(board["passfail"] for board in boards))
 
 
 plc.Write('CR0', 0)  # Disable +24V, +5V PSUs
 sleep(0.5)
 plc.Close()
+if trace is not None:
+    trace.close()
 
 # *************************************************************************
 # ******Generate Report...******
+mark_stage("report")
 print("Generating Report...")
-dut_info = generate_report_dataset(EIB_sn, tester_name, tester_life,
-                                   report_date_formatted, test_data,
-                                   overall_test_passfail, Visual_LED_PassFail)
-plot_pdf(dut_info, report_path)
-os.startfile(report_path)
+for board in boards:
+    dut_info = generate_report_dataset(board["sn"], tester_name, tester_life,
+                                       board["report_date"],
+                                       board["report_time"],
+                                       board["test_data"], board["passfail"],
+                                       board["visual_led"])
+    plot_pdf(dut_info, board["report_path"])
+    os.startfile(board["report_path"])
+for board in boards:
+    save_stage_timings(board["raw_data_path"], board["sn"])
 
 print("Exiting...")
 sleep(5)
+status.stop()
 sys.exit(0)
@@ -0,0 +1,170 @@
+"""This module re-grades stored EIB test runs against candidate pass/fail
+limits and lists the serials whose verdict would change."""
+
+import argparse
+from time import perf_counter
+
+import numpy as np
+
+from grading import LIMITS, reading_limit_name
+from test_data_reader import TEST_DATA_DIR, close_runs, list_runs
+
+LIMIT_NAMES = tuple(LIMITS)
+
+# Graded test points in io_tabulate_results order: (label, state, channel,
+# limit name, True if the reading must be >= the limit, else <=). The
+# limit rules come from grading.py, the same ones main.py grades with.
+TEST_POINTS = [
+    (label, state, chan, *reading_limit_name(chan, state))
+    for label, state, chan in
+    [(f"OUT{i + 1}-PSC OFF", "OFF", i) for i in range(4)] +
+    [(f"IN{i - 3}-PSC OFF", "OFF", i) for i in range(4, 8)] +
+    [(f"OUT{i + 1}-PSC ON", "ON", i) for i in range(4)] +
+    [(f"IN{i - 3}-PSC ON", "ON", i) for i in range(4, 8)] +
+    [("24V_PS", "ON", 8)]
+]
+POINT_LIMIT_INDEX = np.array([LIMIT_NAMES.index(point[3])
+                              for point in TEST_POINTS])
+POINT_GE = np.array([point[4] for point in TEST_POINTS])
+
+
+def current_limits():
+    """The limits main.py grades with today"""
+    return dict(LIMITS)
+
+
+# *************************************************************************
+# ******Load stored runs******
+
+
+def _to_float(text):
+    try:
+        return float(text)
+    except (TypeError, ValueError):
+        return np.nan  # Missing/corrupt reading always fails
+
+
+def load_voltages(runs):
+    """Load every run's readings into arrays.
+
+    Returns (runs_with_data, values, led) where values is an
+    (n_runs, n_points) float array in TEST_POINTS order and led is an
+    (n_runs,) bool array of the visual LED result."""
+    kept, values, led = [], [], []
+    for run in runs:
+        rows = run.read_raw_csv("Voltages")
+        if not rows:
+            continue
+        by_chan = {row["Channel"]: row for row in rows}
+        column = {"OFF": "Voltage (OFF)", "ON": "Voltage (ON)"}
+        values.append([_to_float(by_chan.get(str(chan), {}).get(column[state]))
+                       for _, state, chan, _, _ in TEST_POINTS])
+        led.append(rows[0].get("Visual LED Pass/Fail") == "True")
+        kept.append(run)
+    return kept, np.array(values, dtype=float).reshape(-1, len(TEST_POINTS)), \
+        np.array(led, dtype=bool)
+
+
+def latest_per_serial(runs):
+    """Indices of the most recent run of each serial (the board as
+    shipped); runs are oldest first"""
+    latest = {}
+    for index, run in enumerate(runs):
+        latest[run.serial] = index
+    return sorted(latest.values())
+# *************************************************************************
+
+# *************************************************************************
+# ******Vectorized grading******
+
+
+def grade(values, led, limit_sets):
+    """Grade all runs against all limit sets at once.
+
+    Returns (point_pass, verdict): point_pass is (n_sets, n_runs, n_points)
+    and verdict is (n_sets, n_runs)."""
+    limits = np.array([[limit_set[name] for name in LIMIT_NAMES]
+                       for limit_set in limit_sets], dtype=float)
+    point_limits = limits[:, POINT_LIMIT_INDEX][:, None, :]
+    readings = values[None, :, :]
+    with np.errstate(invalid="ignore"):
+        point_pass = np.where(POINT_GE, readings >= point_limits,
+                              readings <= point_limits)
+    verdict = point_pass.all(axis=2) & led[None, :]
+    return point_pass, verdict
+
+
+def verdict_changes(runs, point_pass, verdict, baseline=0):
+    """For each limit set, the runs whose verdict differs from the
+    baseline set: [[(run, new_verdict, failing point labels), ...], ...]"""
+    changes = []
+    for set_index in range(verdict.shape[0]):
+        changed = np.nonzero(verdict[set_index] != verdict[baseline])[0]
+        changes.append([
+            (runs[i], bool(verdict[set_index, i]),
+             [TEST_POINTS[p][0]
+              for p in np.nonzero(~point_pass[set_index, i])[0]])
+            for i in changed])
+    return changes
+# *************************************************************************
+
+
+def parse_candidate(text, base):
+    """Parse "NAME=value,NAME=value" into a full limit set over base"""
+    limit_set = dict(base)
+    for item in text.split(","):
+        name, _, value = item.partition("=")
+        name = name.strip()
+        if name not in LIMIT_NAMES:
+            raise ValueError(f"Unknown limit {name!r}, expected one of "
+                             f"{', '.join(LIMIT_NAMES)}")
+        limit_set[name] = float(value)
+    return limit_set
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="What-if re-grading of stored EIB runs")
+    parser.add_argument("--root", default=TEST_DATA_DIR,
+                        help="Test data directory")
+    parser.add_argument("--candidate", action="append", default=[],
+                        help="NAME=value[,NAME=value...] overrides of the "
+                             "current limits; repeat for several sets")
+    parser.add_argument("--all-runs", action="store_true",
+                        help="Include retests, not just each serial's "
+                             "latest run")
+    args = parser.parse_args()
+
+    baseline_limits = current_limits()
+    candidates = [parse_candidate(text, baseline_limits)
+                  for text in args.candidate]
+
+    t_load = perf_counter()
+    stored_runs = list_runs(args.root)
+    all_runs, all_values, all_led = load_voltages(stored_runs)
+    close_runs(stored_runs)
+    keep = np.arange(len(all_runs)) if args.all_runs \
+        else np.array(latest_per_serial(all_runs), dtype=int)
+    run_list = [all_runs[i] for i in keep]
+    t_grade = perf_counter()
+    points, verdicts = grade(all_values[keep], all_led[keep],
+                             [baseline_limits] + candidates)
+    t_done = perf_counter()
+
+    print(f"Loaded {len(all_runs)} runs in {1000 * (t_grade - t_load):.1f} "
+          f"ms; graded {len(run_list)} runs x {len(candidates) + 1} limit "
+          f"sets in {1000 * (t_done - t_grade):.2f} ms")
+    print(f"Current limits: {int(verdicts[0].sum())}/{len(run_list)} pass")
+    for number, (candidate, changes) in enumerate(
+            zip(candidates, verdict_changes(run_list, points, verdicts)[1:]),
+            start=1):
+        overrides = {name: value for name, value in candidate.items()
+                     if value != baseline_limits[name]}
+        print(f"\nCandidate {number} {overrides}: "
+              f"{int(verdicts[number].sum())}/{len(run_list)} pass, "
+              f"{len(changes)} verdicts change")
+        for run, passes, failing in changes:
+            change = "FAIL -> PASS" if passes else "PASS -> FAIL"
+            detail = f" ({', '.join(failing)})" if failing else ""
+            print(f"  {run.serial:<8} {run.started:%m/%d/%y %H:%M}  "
+                  f"{change}{detail}")
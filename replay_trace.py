@@ -0,0 +1,95 @@
+"""This module re-runs the I/O test sequence against an instrument trace
+recorded by main.py (TRACE_RECORD), to reproduce a station's run offline."""
+
+import argparse
+import sys
+from time import monotonic
+
+from grading import grade_reading, near_limit
+from instrument_modules.keithley_2100 import Keithley2100
+from instrument_modules.traffic_trace import ReplayMismatchError, \
+    ReplayPLC, TraceReader
+from sequence_engine import PanelLayout, SequenceEngine, point_label
+from settle_calibration import SettleProfile
+from station_config import DMM_ADDRESSES, LED_HOLD_TIME, PANEL_SLOTS, \
+    PLC_READBACK_ENABLED, TWO_SPEED_MEASUREMENT
+
+
+def _scale(seconds, speed):
+    return 0 if speed <= 0 else seconds / speed
+
+
+def scaled_settle(settle, speed):
+    """Copy of a SettleProfile with every delay divided by speed"""
+    return SettleProfile(
+        {chan: {transition: _scale(delay, speed)
+                for transition, delay in delays.items()}
+         for chan, delays in settle.delays.items()},
+        {transition: _scale(delay, speed)
+         for transition, delay in settle.defaults.items()},
+        settle.created)
+
+
+def _cell(engine, chan, state):
+    """One table cell: the replayed voltage and its grade"""
+    voltages = engine.voltage_off if state == "OFF" else engine.voltage_on
+    passfail = engine.grades.get((chan, state))
+    verdict = "" if passfail is None else "PASS" if passfail else "FAIL"
+    return f"{voltages.get(chan)!s:>10}{verdict:>6}"
+
+
+def replay(path, speed=1.0, strict=False):
+    """Replay the io_test() portion of a trace. Returns (engine, reader,
+    elapsed seconds)."""
+    reader = TraceReader(path, speed=speed, start_mark="io_test",
+                         end_mark="io_test_end", strict=strict)
+    meters = [Keithley2100("REPLAY", address, trace=reader)
+              for address in DMM_ADDRESSES]
+    panel = PanelLayout(PANEL_SLOTS)
+    engine = SequenceEngine(
+        ReplayPLC(reader), meters, panel.channel_meter_map,
+        scaled_settle(SettleProfile.load(), speed), grader=grade_reading,
+        input_tags=panel.input_tags if PLC_READBACK_ENABLED else None,
+        recheck=near_limit if TWO_SPEED_MEASUREMENT else None,
+        led_hold=_scale(LED_HOLD_TIME, speed), tag_map=panel.tag_map)
+    start = monotonic()
+    engine.run()
+    return engine, reader, monotonic() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Replay a recorded EIB instrument trace")
+    parser.add_argument("trace", help="*_Instrument_Trace.jsonl.gz file")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Replay speed, 1 = real time, 0 = no waits")
+    parser.add_argument("--strict", action="store_true",
+                        help="Stop at the first call the trace did not "
+                             "record")
+    args = parser.parse_args()
+
+    try:
+        replay_engine, replay_reader, elapsed = replay(args.trace, args.speed,
+                                                       args.strict)
+    except ReplayMismatchError as e:
+        sys.exit(f"Replay diverged from the trace: {e}")
+
+    header = replay_reader.header
+    print(f"Trace: {args.trace}")
+    print(f"S/N: {header.get('eib_sn')}  Station: "
+          f"{header.get('station_id')}  Recorded: {header.get('created')}")
+    print(f"{'Chan':<6}{'OFF (V)':>10}{'':>6}{'ON (V)':>10}")
+    for replay_chan in sorted(replay_engine.channel_meter_map):
+        print(f"{point_label(replay_chan)!s:<6}"
+              f"{_cell(replay_engine, replay_chan, 'OFF')}"
+              f"{_cell(replay_engine, replay_chan, 'ON')}")
+    print(f"Replayed in {elapsed:.2f} s at speed {args.speed}")
+
+    remaining = replay_reader.remaining()
+    if replay_reader.mismatches:
+        print(f"{len(replay_reader.mismatches)} calls did not match the "
+              "trace.")
+    if remaining:
+        print(f"Calls recorded but not replayed: {remaining}")
+    if replay_reader.mismatches or remaining:
+        sys.exit(1)
@@ -130,10 +130,12 @@ def plot_pdf(dut_info, report_path):
     ]
     for io_port, (voltage, result) in dut_info['TestData'].items():
         if io_port == "Visual_LED": continue  # Skip "Visual_LED"
+        # Voltages get units; PLC readback entries are shown as-is
+        value = f"{voltage} V" if isinstance(voltage, (int, float)) else f"{voltage}"
         if result:
-            output_data.append([io_port, f"{voltage} V", "Pass"])
+            output_data.append([io_port, value, "Pass"])
         else:
-            output_data.append([io_port, f"{voltage} V", "Fail"])
+            output_data.append([io_port, value, "Fail"])
 
 
     # Add the tables to the Story
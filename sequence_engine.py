@@ -0,0 +1,328 @@
+"""This module runs the EIB I/O test sequence on an asyncio event loop.
+Settle waits are deadlines from when each relay command went out, and
+channels on different DMMs are measured in parallel lanes."""
+
+import asyncio
+import csv
+from concurrent.futures import ThreadPoolExecutor
+
+from station_config import FAST_PROFILE, LED_HOLD_TIME, \
+    PASSTHROUGH_CHANNEL, PRECISE_PROFILE
+from status_server import StatusPublisher
+
+
+def channel_lanes(channel_meter_map):
+    """Group channels by the DMM they are wired to, in channel order"""
+    lanes = {}
+    for chan in sorted(channel_meter_map):
+        lanes.setdefault(channel_meter_map[chan], []).append(chan)
+    return lanes
+
+
+def board_channel(point):
+    """Board channel number of a sequence point"""
+    return point[1] if isinstance(point, tuple) else point
+
+
+def point_slot(point):
+    """Panel slot of a sequence point (None on a single-EIB fixture)"""
+    return point[0] if isinstance(point, tuple) else None
+
+
+def point_label(point):
+    """Sequence point as written to the timing log: the channel number,
+    or slot:channel on a multi-up fixture"""
+    return f"{point[0]}:{point[1]}" if isinstance(point, tuple) else point
+
+
+class PanelLayout:
+    """PLC tag and DMM wiring of every EIB slot on the fixture.
+
+    slots is a list of {"tags": {chan: (DO1 tag, DO2 tag)}, "inputs":
+    {chan: input tag}, "meters": {chan: DMM index}}, one per EIB (see
+    PANEL_SLOTS). Sequence points are plain channel numbers when the
+    fixture holds one EIB, so its runs look exactly as before, and
+    (slot, channel) pairs when it holds several."""
+
+    def __init__(self, slots):
+        self.slots = slots
+        self.channel_meter_map = {}  # {point: DMM index}
+        self.tag_map = {}  # {point: (DO1 tag, DO2 tag)}
+        self.input_tags = {}  # {point: PLC input tag}
+        for slot, wiring in enumerate(slots):
+            for chan, tags in wiring["tags"].items():
+                point = self.point(slot, chan)
+                self.channel_meter_map[point] = wiring["meters"][chan]
+                self.tag_map[point] = tags
+            for chan, tag in wiring["inputs"].items():
+                self.input_tags[self.point(slot, chan)] = tag
+
+    def point(self, slot, chan):
+        """Sequence point of one board channel"""
+        return chan if len(self.slots) == 1 else (slot, chan)
+
+    def slot_points(self, slot):
+        """{chan: point} for one slot"""
+        return {chan: self.point(slot, chan)
+                for chan in sorted(self.slots[slot]["tags"])}
+
+    def output_tags(self, slot=None):
+        """Every PLC output tag driven for one slot, or for all of them"""
+        return {tag for point, tags in self.tag_map.items()
+                if slot is None or point_slot(point) in (None, slot)
+                for tag in tags}
+
+
+def _round(voltage):
+    return None if voltage is None else round(voltage, 3)
+
+
+class SequenceEngine:
+    """Deadline-driven I/O test sequence for one EIB, or for a panel of
+    EIBs when channel_meter_map/tag_map/input_tags come from a
+    PanelLayout"""
+    # *************************************************************************
+    # ******Initialize Engine******
+    def __init__(self, plc, meters, channel_meter_map, settle, status=None,
+                 grader=None, timing_log_path=None, input_tags=None,
+                 recheck=None, led_hold=LED_HOLD_TIME, tag_map=None):
+        self.plc = plc
+        self.meters = meters
+        self.channel_meter_map = channel_meter_map
+        self.settle = settle
+        self.status = status if status is not None \
+            else StatusPublisher(None, enabled=False)
+        self.grader = grader  # grader(chan, state, voltage) -> bool
+        self.timing_log_path = timing_log_path
+        self.input_tags = input_tags  # {chan: PLC input tag}, None = off
+        self.readback = {}  # {(chan, state): [(tag, value, status), ...]}
+        self.write_errors = []  # [(tag, value, status), ...]
+        self.recheck = recheck  # recheck(chan, state, voltage) -> bool
+        self.rechecked = {}  # {(chan, state): fast reading replaced}
+        self.led_hold = led_hold
+        self.tag_map = tag_map  # {point: (DO1 tag, DO2 tag)}, None = DO1_x
+        self.voltage_off = {}
+        self.voltage_on = {}
+        self.grades = {}
+        self.timings = []  # [step, channel, start_s, end_s]
+        self._timings_flushed = 0
+        self._loop = None
+        self._t0 = 0
+        self._tasks = set()
+        # pylogix and file writes are not thread-safe: one thread each
+        self._plc_executor = ThreadPoolExecutor(max_workers=1)
+        self._file_executor = ThreadPoolExecutor(max_workers=1)
+        self._async_meters = []
+
+    def run(self):
+        """Run the sequence, return (io_voltage_op_off, io_voltage_op_on)"""
+        try:
+            asyncio.run(self._run())
+        finally:
+            for async_meter in self._async_meters:
+                async_meter.close()
+            self._plc_executor.shutdown(wait=True)
+            self._file_executor.shutdown(wait=True)
+        chans = sorted(self.channel_meter_map)
+        return [self.voltage_off[chan] for chan in chans], \
+            [self.voltage_on[chan] for chan in chans]
+
+    # *************************************************************************
+    # ******Timing helpers******
+    def _now(self):
+        return self._loop.time()
+
+    def _log(self, step, chan, start, end=None):
+        end = self._now() if end is None else end
+        self.timings.append([step, point_label(chan),
+                             round(start - self._t0, 3),
+                             round(end - self._t0, 3)])
+
+    async def _until(self, deadline):
+        """Sleep until an absolute loop-time deadline"""
+        delay = deadline - self._now()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _step(self, name, chan):
+        """Publish a step on the status lane of the channel's DMM"""
+        self.status.step(name, chan, lane=self.channel_meter_map[chan])
+
+    def _spawn(self, coro):
+        """Run background work while the sequence waits on deadlines"""
+        task = self._loop.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    # *************************************************************************
+    # ******Instrument I/O******
+    def _tags(self, chan):
+        """(input drive tag, DMM relay tag) of a sequence point"""
+        if self.tag_map is None:
+            return f"DO1_{chan}", f"DO2_{chan}"
+        return self.tag_map[chan]
+
+    async def _write(self, writes, step, chan):
+        """Write [(tag, value), ...] in one PLC request and return the
+        loop time at which the command went out"""
+        start = self._now()
+        responses = await self._loop.run_in_executor(
+            self._plc_executor, self.plc.Write, writes)
+        sent = self._now()
+        self._log(step, chan, start, sent)
+        if not isinstance(responses, list):
+            responses = [responses]
+        for (tag, value), response in zip(writes, responses):
+            if getattr(response, "Status", "Success") != "Success":
+                print(f"Error writing {tag}={value}: {response.Status}")
+                self.write_errors.append((tag, value, response.Status))
+        return sent
+
+    async def _read_tags(self, chan, state):
+        """Read the channel's outputs and all EIB-driven inputs in one
+        PLC request"""
+        tags = list(self._tags(chan)) + [
+            tag for point, tag in self.input_tags.items()
+            if point_slot(point) == point_slot(chan)]
+        start = self._now()
+        try:
+            responses = await self._loop.run_in_executor(
+                self._plc_executor, self.plc.Read, tags)
+        except Exception as e:  # pylint: disable=broad-except
+            print(f"Error reading PLC tags {tags}: {e}")
+            responses = []
+        self._log(f"readback_{state.lower()}", chan, start)
+        self.readback[(chan, state)] = [
+            (response.TagName, response.Value, response.Status)
+            for response in responses]
+
+    async def _measure(self, chan, state):
+        self._step(f"measure_{state.lower()}", chan)
+        start = self._now()
+        meter = self._async_meters[self.channel_meter_map[chan]]
+        profile = None if self.recheck is None else FAST_PROFILE
+        if self.input_tags is None:
+            voltage = await meter.meas_dcv(profile=profile)
+        else:
+            voltage, _ = await asyncio.gather(meter.meas_dcv(profile=profile),
+                                              self._read_tags(chan, state))
+        voltage = _round(voltage)
+        self._log(f"measure_{state.lower()}", chan, start)
+
+        if self.recheck is not None and \
+                self.recheck(board_channel(chan), state, voltage):
+            # Too close to the limit for a fast reading: measure precisely
+            self._step(f"remeasure_{state.lower()}", chan)
+            start = self._now()
+            self.rechecked[(chan, state)] = voltage
+            voltage = _round(await meter.meas_dcv(profile=PRECISE_PROFILE))
+            self._log(f"remeasure_{state.lower()}", chan, start)
+        self._spawn(self._record(chan, state, voltage))
+        return voltage
+
+    # *************************************************************************
+    # ******Background work******
+    async def _record(self, chan, state, voltage):
+        """Grade and publish one reading"""
+        passfail = None
+        if self.grader is not None:
+            passfail = self.grader(board_channel(chan), state, voltage)
+            self.grades[(chan, state)] = passfail
+        self.status.measurement(chan, state, voltage, passfail)
+
+    def _append_timings(self, rows, write_header):
+        with open(self.timing_log_path, mode='a', newline='',
+                  encoding='utf-8') as file:
+            writer = csv.writer(file)
+            if write_header:
+                writer.writerow(["Step", "Channel", "Start (s)", "End (s)"])
+            writer.writerows(rows)
+
+    async def _flush_timings(self):
+        """Append timing rows logged since the last flush"""
+        if self.timing_log_path is None:
+            return
+        rows = self.timings[self._timings_flushed:]
+        write_header = self._timings_flushed == 0
+        self._timings_flushed = len(self.timings)
+        try:
+            await self._loop.run_in_executor(
+                self._file_executor, self._append_timings, rows,
+                write_header)
+        except Exception as e:  # pylint: disable=broad-except
+            print(f"Error writing to {self.timing_log_path}: {e}")
+
+    # *************************************************************************
+    # ******Sequence******
+    async def _run(self):
+        self._loop = asyncio.get_running_loop()
+        self._t0 = self._now()
+        self._async_meters = [meter.as_async() for meter in self.meters]
+        await asyncio.gather(*(
+            self._lane(meter, chans) for meter, chans in
+            channel_lanes(self.channel_meter_map).items()))
+        await self._flush_timings()
+        while self._tasks:
+            await asyncio.gather(*self._tasks)
+
+    async def _lane(self, meter, chans):
+        lit = None  # (chan, led_deadline) of the input still switched on
+        dmm_free = self._now()  # Previous DMM relay has released
+
+        for chan in chans:
+            drive, relay = self._tags(chan)
+            # Settle delays are calibrated per board channel
+            board_chan = board_channel(chan)
+            # Enable DMM for the channel, input disabled
+            await self._until(dmm_free)
+            self._step("settle_off", chan)
+            sent = await self._write([(drive, 0), (relay, 1)],
+                                     "write_off", chan)
+            deadline = sent + self.settle.delay(board_chan, "off")
+            await self._until(deadline)
+            self._log("settle_off", chan, sent, deadline)
+            voltage = await self._measure(
+                chan, "ON" if board_chan == PASSTHROUGH_CHANNEL else "OFF")
+
+            if board_chan == PASSTHROUGH_CHANNEL:
+                # 24VDC passthrough is only measured with its input OFF
+                self.voltage_off[chan] = 0
+                self.voltage_on[chan] = voltage
+            else:
+                self.voltage_off[chan] = voltage
+
+                # Previous LED pair goes off as this channel's input goes on
+                writes = [(drive, 1), (relay, 1)]
+                on_delay = self.settle.delay(board_chan, "on")
+                if lit is not None:
+                    await self._until(lit[1])
+                    self._log("led_hold", lit[0], lit[1] - self.led_hold,
+                              lit[1])
+                    writes.insert(0, (self._tags(lit[0])[0], 0))
+                    # Let the previous input finish switching off too
+                    on_delay = max(on_delay, self.settle.delay(
+                        board_channel(lit[0]), "reset"))
+                self._step("settle_on", chan)
+                sent = await self._write(writes, "write_on", chan)
+                deadline = sent + on_delay
+                await self._until(deadline)
+                self._log("settle_on", chan, sent, deadline)
+                self.voltage_on[chan] = await self._measure(chan, "ON")
+                lit = (chan, sent + self.led_hold)
+
+            # Disconnect the DMM; the input stays on for the LED hold
+            self._step("reset", chan)
+            sent = await self._write([(relay, 0)], "write_reset", chan)
+            dmm_free = sent + self.settle.delay(board_chan, "release")
+            self._spawn(self._flush_timings())
+
+        if lit is not None:
+            self._step("led_hold", lit[0])
+            await self._until(lit[1])
+            self._log("led_hold", lit[0], lit[1] - self.led_hold, lit[1])
+            sent = await self._write([(self._tags(lit[0])[0], 0)],
+                                     "write_reset", lit[0])
+            dmm_free = max(dmm_free, sent + self.settle.delay(
+                board_channel(lit[0]), "reset"))
+        await self._until(dmm_free)
+        self.status.end_step(meter)
@@ -0,0 +1,213 @@
+"""This module measures the relay and output settle times of an EIB test
+fixture and saves them as the profile io_test() uses for its delays.
+Run standalone with a known-good EIB installed and powered."""
+
+import json
+import os
+from datetime import datetime
+from statistics import median
+from time import monotonic, sleep
+
+from station_config import DEFAULT_SETTLE_DELAYS, PASSTHROUGH_CHANNEL, \
+    SETTLE_PROFILE_MAX_AGE_HOURS, SETTLE_PROFILE_PATH
+
+# Named after the io_test() step that waits on them. reset is the previous
+# input switching off with the next channel's ON write; release is the DMM
+# relay opening, timed with the input in whichever state puts a large
+# voltage on the DMM.
+TRANSITIONS = ("off", "on", "reset", "release")
+# (DO1, DO2) written before the transition, and after it
+TRANSITION_STATES = {
+    "off": ((0, 0), (0, 1)),
+    "on": ((0, 1), (1, 1)),
+    "reset": ((1, 1), (0, 1)),
+}
+
+CALIBRATION_REPEATS = 3  # Keep the worst of this many runs
+CALIBRATION_TIMEOUT = 3.0  # Give up waiting for a channel to settle (s)
+CALIBRATION_PRE_WAIT = 2.0  # Time allowed for the starting state (s)
+CALIBRATION_PROFILE = "fast"  # Shortest DMM integration
+SETTLE_TOLERANCE_V = 0.05  # Reading counts as settled within this...
+SETTLE_TOLERANCE_REL = 0.01  # ...or this fraction of the final value
+SETTLE_TAIL_READINGS = 5  # Readings whose median is the final value
+MARGIN_REL = 0.25  # Safety margin added to the measured settle time...
+MARGIN_ABS = 0.05  # ...plus this many seconds
+MIN_DELAY = 0.05  # Never go below this delay (s)
+
+
+# *************************************************************************
+# ******Settle Profile******
+
+
+class SettleProfile:
+    """Per-channel, per-transition delays for io_test()"""
+
+    def __init__(self, delays=None, defaults=None, created=None):
+        self.delays = delays or {}  # {chan: {transition: seconds}}
+        # Profiles saved before a transition existed use its default
+        self.defaults = {**DEFAULT_SETTLE_DELAYS, **(defaults or {})}
+        self.created = created
+
+    def delay(self, chan, transition):
+        """Delay for one channel and transition, falling back to the
+        default when the channel was not calibrated"""
+        return self.delays.get(chan, {}).get(transition,
+                                             self.defaults[transition])
+
+    def wave_delay(self, chans, transition):
+        """Delay for several channels switched together"""
+        return max(self.delay(chan, transition) for chan in chans)
+
+    def save(self, path=SETTLE_PROFILE_PATH, raw=None):
+        """Write the profile (and optional raw settle times) as JSON"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        data = {
+            "created": self.created,
+            "margin_rel": MARGIN_REL,
+            "margin_abs": MARGIN_ABS,
+            "defaults": self.defaults,
+            "channels": {str(chan): delays
+                         for chan, delays in sorted(self.delays.items())},
+            "raw_settle_times": raw or {},
+        }
+        with open(path, mode='w', encoding='utf-8') as file:
+            json.dump(data, file, indent=2)
+        print(f"Settle profile saved to: {path}")
+
+    @classmethod
+    def load(cls, path=SETTLE_PROFILE_PATH):
+        """Load a saved profile, or return the default delays if there is
+        none"""
+        try:
+            with open(path, mode='r', encoding='utf-8') as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            print(f"No settle profile at {path}, using default delays.")
+            return cls()
+        except (OSError, ValueError) as e:
+            print(f"Error reading settle profile {path}: {e}. "
+                  "Using default delays.")
+            return cls()
+
+        profile = cls({int(chan): delays
+                       for chan, delays in data["channels"].items()},
+                      data.get("defaults"), data.get("created"))
+        if profile.created:
+            age = datetime.now() - datetime.fromisoformat(profile.created)
+            if age.total_seconds() > SETTLE_PROFILE_MAX_AGE_HOURS * 3600:
+                print(f"Warning: settle profile is {age} old. Consider "
+                      "re-running settle_calibration.py.")
+        return profile
+# *************************************************************************
+
+# *************************************************************************
+# ******Calibration******
+
+
+def transition_states(chan, transition):
+    """(DO1, DO2) written before and after a transition on one channel"""
+    if transition == "release":
+        # INx-PSC channels read high with their input ON, OUTx-PSC with it
+        # OFF; the 24V passthrough reads high either way
+        drive = 0 if chan < 4 or chan == PASSTHROUGH_CHANNEL else 1
+        return (drive, 1), (drive, 0)
+    return TRANSITION_STATES[transition]
+
+
+def _write_state(plc, chan, state):
+    plc.Write(f"DO1_{chan}", state[0])
+    plc.Write(f"DO2_{chan}", state[1])
+
+
+def settle_time(samples):
+    """Given [(seconds_since_switch, volts), ...], return the time after
+    which every reading stays within tolerance of the final value, or None
+    if the channel never settled"""
+    if len(samples) < SETTLE_TAIL_READINGS:
+        return None
+    final = median(volts for _, volts in samples[-SETTLE_TAIL_READINGS:])
+    tolerance = max(SETTLE_TOLERANCE_V, abs(final) * SETTLE_TOLERANCE_REL)
+    # The final readings must themselves agree, else it is still moving
+    if any(abs(volts - final) > tolerance
+           for _, volts in samples[-SETTLE_TAIL_READINGS:]):
+        return None
+    settled_at = samples[-SETTLE_TAIL_READINGS][0]
+    for stamp, volts in reversed(samples):
+        if abs(volts - final) > tolerance:
+            break
+        settled_at = stamp
+    return settled_at
+
+
+def measure_transition(plc, dmm, chan, transition):
+    """Switch one channel through a transition and return its settle
+    time in seconds (None if it did not settle)"""
+    before, after = transition_states(chan, transition)
+    _write_state(plc, chan, before)
+    sleep(CALIBRATION_PRE_WAIT)
+
+    _write_state(plc, chan, after)
+    t_switch = monotonic()
+    samples = []
+    while monotonic() - t_switch < CALIBRATION_TIMEOUT:
+        voltage = dmm.meas_dcv(profile=CALIBRATION_PROFILE)
+        if voltage is not None:
+            # Stamp with the completion time so slow readings err long
+            samples.append((monotonic() - t_switch, voltage))
+
+    _write_state(plc, chan, (0, 0))
+    return settle_time(samples)
+
+
+def calibrate(plc, dmms, channel_meter_map, repeats=CALIBRATION_REPEATS):
+    """Measure every channel/transition and return (SettleProfile, raw)"""
+    delays = {}
+    raw = {}
+    for chan in sorted(channel_meter_map):
+        dmm = dmms[channel_meter_map[chan]]
+        transitions = ("off", "release") if chan == PASSTHROUGH_CHANNEL \
+            else TRANSITIONS
+        delays[chan] = {}
+        raw[str(chan)] = {}
+        for transition in transitions:
+            times = [measure_transition(plc, dmm, chan, transition)
+                     for _ in range(repeats)]
+            raw[str(chan)][transition] = times
+            if None in times:
+                delays[chan][transition] = DEFAULT_SETTLE_DELAYS[transition]
+                print(f"Channel {chan} {transition}: did not settle within "
+                      f"{CALIBRATION_TIMEOUT} s, keeping default "
+                      f"{delays[chan][transition]} s")
+                continue
+            delay = max(MIN_DELAY, max(times) * (1 + MARGIN_REL) + MARGIN_ABS)
+            delays[chan][transition] = round(delay, 3)
+            print(f"Channel {chan} {transition}: settled in "
+                  f"{max(times):.3f} s, delay {delays[chan][transition]} s")
+
+    created = datetime.now().isoformat(timespec="seconds")
+    return SettleProfile(delays, created=created), raw
+# *************************************************************************
+
+
+if __name__ == "__main__":  # Standalone execution calibrates the fixture...
+    from pylogix import PLC
+    from instrument_modules.keithley_2100 import Keithley2100
+    from station_config import PLC_IP_ADDRESS, DMM_ADDRESSES, \
+        CHANNEL_METER_MAP
+
+    print("Fixture settle-time calibration. Install a known-good EIB with "
+          "JP1-4, F1 and TB1-4, J1 connected.")
+    input("Press return to power ON and begin...")
+    cal_plc = PLC()
+    cal_plc.IPAddress = PLC_IP_ADDRESS
+    cal_dmms = [Keithley2100(connection_method="USB", address=address)
+                for address in DMM_ADDRESSES]
+    cal_plc.Write("CR0", 1)  # Enable +24V, +5V PSUs
+    sleep(CALIBRATION_PRE_WAIT)
+    try:
+        cal_profile, cal_raw = calibrate(cal_plc, cal_dmms,
+                                         CHANNEL_METER_MAP)
+        cal_profile.save(raw=cal_raw)
+    finally:
+        cal_plc.Write("CR0", 0)  # Disable +24V, +5V PSUs
+        cal_plc.Close()
@@ -0,0 +1,108 @@
+"""This module holds the per-station settings shared by main.py and the
+standalone station tools."""
+
+import os
+
+# *************************************************************************
+# ******Pass/Fail Limits******
+# Used by main.py to grade each board and by regrade.py to re-grade
+# stored runs against candidate limits.
+
+OUTx_PSC_FAIL_THRES_OFF = 4.5  # Make sure output is >4.5V
+INx_PSC_FAIL_THRES_OFF = 0.2  # Make sure output is <100mV
+
+OUTx_PSC_FAIL_THRES_ON = 0.3  # Make sure output is <= 300mV
+INx_PSC_FAIL_THRES_ON = 18  # Make sure input is >15VDC
+PS_24V_FAIL_THRES = 23  # Make sure 24V passthrough is >= 23VDC
+# *************************************************************************
+
+# *************************************************************************
+# ******Two-Speed Measurement******
+# Each reading is taken with the fast DMM profile first and re-measured
+# with the precise profile only when it lands within the guard band of
+# its pass/fail limit.
+
+TWO_SPEED_MEASUREMENT = True
+FAST_PROFILE = "fast"
+PRECISE_PROFILE = "precise"
+GUARD_BAND_V = 0.05  # Re-measure within this many volts of the limit...
+GUARD_BAND_REL = 0.02  # ...or within this fraction of the limit
+# *************************************************************************
+
+# *************************************************************************
+# ******Set Insturment IP Addresses******
+
+PLC_IP_ADDRESS = "10.0.142.100"  # Set PLC IP Address here
+DMM_ADDRESS = "USB0::0x05E6::0x2100::8020356::INSTR"
+# Additional DMMs may be listed here. CHANNEL_METER_MAP picks the DMM that
+# each channel's measurement relay (DO2_x) is wired to; channels on
+# different DMMs are measured at the same time.
+DMM_ADDRESSES = [DMM_ADDRESS]
+CHANNEL_METER_MAP = {chan: 0 for chan in range(9)}
+PASSTHROUGH_CHANNEL = 8  # 24VDC passthrough on TB4, measured ON only
+# *************************************************************************
+
+# *************************************************************************
+# ******PLC Readback******
+# Each reading is paired with one multi-tag PLC Read of the channel's
+# DO1/DO2 outputs and every EIB-driven input below, so the digital path
+# IN(1-4)-PSC -> IB16-(0-3) is verified alongside the J1 voltage.
+
+# Off until the input tag names below are confirmed against the tags in
+# EIB_Test_PLC.ACD: a wrong name reads back as an error and fails every
+# board.
+PLC_READBACK_ENABLED = False
+# Input tag read for each INx-PSC channel; match the PLC program's names
+PLC_INPUT_TAGS = {4: "DI1_0", 5: "DI1_1", 6: "DI1_2", 7: "DI1_3"}
+# *************************************************************************
+
+# *************************************************************************
+# ******Multi-Up Fixture******
+# One entry per EIB position, in the order the S/Ns are entered. Power-up
+# (CR0), PLC init and operator prompts run once for the whole panel; each
+# board gets its own Test_Data run and report.
+#   tags   - board channel (0-8) -> (input drive tag, DMM relay tag)
+#   inputs - INx-PSC channel -> PLC input tag it drives (readback)
+#   meters - board channel -> DMM (index into DMM_ADDRESSES)
+# Example second slot on a second output card and its own DMM:
+#   {"tags": {chan: (f"DO3_{chan}", f"DO4_{chan}") for chan in range(9)},
+#    "inputs": {4: "DI2_0", 5: "DI2_1", 6: "DI2_2", 7: "DI2_3"},
+#    "meters": {chan: 1 for chan in range(9)}},
+
+PANEL_SLOTS = [
+    {"tags": {chan: (f"DO1_{chan}", f"DO2_{chan}") for chan in range(9)},
+     "inputs": PLC_INPUT_TAGS,
+     "meters": CHANNEL_METER_MAP},
+]
+# *************************************************************************
+
+# *************************************************************************
+# ******Live Status Endpoint (optional)******
+
+STATION_ID = "EIB-Station-1"  # Name shown to supervisors on /status
+STATUS_SERVER_ENABLED = False  # Set True to serve http://<host>:<port>/status
+STATUS_SERVER_PORT = 8026
+STATUS_HISTORY_LEN = 20  # Number of recent results kept for the session
+# *************************************************************************
+
+# *************************************************************************
+# ******Fixture Settle Times******
+# Delays used when no calibration profile exists (or for channels missing
+# from it). Run settle_calibration.py once per fixture/shift to replace
+# these guesses with measured values.
+
+SETTLE_PROFILE_PATH = os.path.join("Calibration", "settle_profile.json")
+SETTLE_PROFILE_MAX_AGE_HOURS = 12  # Warn when the profile is older
+DEFAULT_SETTLE_DELAYS = {"off": 0.5, "on": 0.5, "reset": 0.5,
+                         "release": 0.5}
+LED_HOLD_TIME = 2  # Seconds each LED pair stays lit for the visual check
+# *************************************************************************
+
+# *************************************************************************
+# ******Instrument Traffic Recording******
+# Save every PLC and DMM call of a run to
+# raw_data/<sn>_Instrument_Trace.jsonl.gz; replay_trace.py re-runs the
+# I/O test from it offline.
+
+TRACE_RECORD = False
+# *************************************************************************
@@ -0,0 +1,218 @@
+"""This module serves a lightweight HTTP/JSON status endpoint so the
+progress of an EIB test station can be watched remotely."""
+
+import json
+import queue
+import threading
+from collections import deque
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import monotonic
+
+
+class StatusPublisher:
+    """Collect test sequence events and serve them as JSON at /status"""
+    # *************************************************************************
+    # ******Initialize Publisher******
+    def __init__(self, station_id, host="0.0.0.0", port=8026, history_len=20,
+                 enabled=True):
+        self.station_id = station_id
+        self.host = host
+        self.port = port
+        self.enabled = enabled
+        self._events = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._httpd = None
+        self._threads = []
+        self._run_t0 = None
+        self._step_t0 = {}  # {lane: monotonic start of its current step}
+        self._history = deque(maxlen=history_len)
+        self._session = {"started": datetime.now().isoformat(
+                             timespec="seconds"),
+                         "runs": 0, "passed": 0, "failed": 0}
+        self._run = self._idle_run()
+
+    @staticmethod
+    def _idle_run():
+        return {"state": "idle", "eib_sn": None, "technician": None,
+                "started": None, "current_step": None,
+                "current_channel": None, "lanes": {}, "step_timings": [],
+                "measurements": [], "passed_so_far": 0, "failed_so_far": 0}
+
+    # *************************************************************************
+    # ******Start/Stop******
+    def start(self):
+        """Start the event worker and HTTP server threads"""
+        if not self.enabled:
+            return
+        try:
+            self._httpd = ThreadingHTTPServer((self.host, self.port),
+                                              self._make_handler())
+        except OSError as e:
+            print(f"Status server could not bind {self.host}:{self.port}: {e}")
+            self.enabled = False
+            return
+        self._httpd.daemon_threads = True
+        for target in (self._consume_events, self._httpd.serve_forever):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        print(f"Status server listening on http://{self.host}:{self.port}"
+              "/status")
+
+    def stop(self):
+        """Stop serving status"""
+        if self._httpd is not None:
+            self._events.put(None)
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    # *************************************************************************
+    # ******Publishing (called from the test sequence)******
+    def publish(self, event, **fields):
+        """Queue an event for the worker thread. Never blocks."""
+        if self.enabled:
+            self._events.put((event, monotonic(), fields))
+
+    def run_started(self, eib_sn, technician=None):
+        """Mark the start of a new board test"""
+        self.publish("run_started", eib_sn=eib_sn, technician=technician)
+
+    def step(self, name, channel=None, lane=None):
+        """Mark the start of a named step, closing out the previous step of
+        the same lane. Steps without a lane are run stages; each DMM lane
+        of the sequence engine tracks its own step."""
+        self.publish("step", name=name, channel=channel, lane=lane)
+
+    def end_step(self, lane=None):
+        """Close out the current step of a lane"""
+        self.publish("end_step", lane=lane)
+
+    def measurement(self, channel, state, voltage, passfail=None):
+        """Record a DMM reading and, if already graded, its result"""
+        self.publish("measurement", channel=channel, state=state,
+                     voltage=voltage, passfail=passfail)
+
+    def run_finished(self, passfail):
+        """Mark the end of the current board test"""
+        self.publish("run_finished", passfail=bool(passfail))
+
+    # *************************************************************************
+    # ******Worker thread******
+    def _consume_events(self):
+        while True:
+            item = self._events.get()
+            if item is None:
+                return
+            event, stamp, fields = item
+            with self._lock:
+                self._apply(event, stamp, fields)
+
+    def _current(self, lane):
+        """The status entry holding a lane's current step and channel"""
+        if lane is None:
+            return self._run
+        return self._run["lanes"].setdefault(
+            str(lane), {"current_step": None, "current_channel": None})
+
+    def _close_step(self, stamp, lane):
+        current = self._current(lane)
+        step_t0 = self._step_t0.pop(lane, None)
+        if current["current_step"] is not None and step_t0 is not None:
+            self._run["step_timings"].append({
+                "step": current["current_step"],
+                "channel": current["current_channel"],
+                "lane": lane,
+                "start_s": round(step_t0 - self._run_t0, 3),
+                "duration_s": round(stamp - step_t0, 3)})
+        current.update(current_step=None, current_channel=None)
+
+    def _apply(self, event, stamp, fields):
+        run = self._run
+        if event == "run_started":
+            self._run = self._idle_run()
+            self._run.update(state="running", eib_sn=fields["eib_sn"],
+                             technician=fields["technician"],
+                             started=datetime.now().isoformat(
+                                 timespec="seconds"))
+            self._run_t0 = stamp
+            self._step_t0 = {}
+        elif self._run_t0 is None:
+            return  # Ignore events published outside of a run
+        elif event == "step":
+            self._close_step(stamp, fields["lane"])
+            self._current(fields["lane"]).update(
+                current_step=fields["name"],
+                current_channel=fields["channel"])
+            self._step_t0[fields["lane"]] = stamp
+        elif event == "end_step":
+            self._close_step(stamp, fields["lane"])
+        elif event == "measurement":
+            run["measurements"].append(fields)
+            if fields["passfail"] is not None:
+                run["passed_so_far" if fields["passfail"]
+                    else "failed_so_far"] += 1
+        elif event == "run_finished":
+            for lane in list(self._step_t0):
+                self._close_step(stamp, lane)
+            cycle_s = round(stamp - self._run_t0, 3)
+            run.update(state="passed" if fields["passfail"] else "failed",
+                       current_channel=None, elapsed_s=cycle_s)
+            self._session["runs"] += 1
+            self._session["passed" if fields["passfail"] else "failed"] += 1
+            self._history.appendleft({"eib_sn": run["eib_sn"],
+                                      "started": run["started"],
+                                      "passfail": fields["passfail"],
+                                      "cycle_s": cycle_s})
+            self._run_t0 = None
+
+    # *************************************************************************
+    # ******HTTP******
+    def snapshot(self):
+        """Return a JSON-serializable copy of the current status"""
+        with self._lock:
+            run = json.loads(json.dumps(self._run))
+            if self._run_t0 is not None:
+                run["elapsed_s"] = round(monotonic() - self._run_t0, 1)
+            return {"station_id": self.station_id,
+                    "time": datetime.now().isoformat(timespec="seconds"),
+                    "session": dict(self._session),
+                    "run": run,
+                    "history": list(self._history)}
+
+    def _make_handler(self):
+        publisher = self
+
+        class StatusHandler(BaseHTTPRequestHandler):
+            """Serve the status snapshot"""
+            def do_GET(self):  # pylint: disable=invalid-name
+                """Handle GET /status"""
+                if self.path.rstrip("/") not in ("", "/status"):
+                    self.send_error(404)
+                    return
+                body = json.dumps(publisher.snapshot()).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):  # pylint: disable=W0622
+                pass  # Keep the test console clean
+
+        return StatusHandler
+
+
+if __name__ == "__main__":  # Standalone execution serve a demo status...
+    from time import sleep
+    demo = StatusPublisher("demo-station", host="127.0.0.1")
+    demo.start()
+    demo.run_started("0000", "Demo Tech")
+    for demo_chan in range(9):
+        demo.step("io_channel", demo_chan)
+        demo.measurement(demo_chan, "ON", 24.0)
+        sleep(1)
+    demo.run_finished(True)
+    input("Press return to stop the status server...")
+    demo.stop()
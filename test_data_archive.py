@@ -0,0 +1,152 @@
+"""This module packs old EIB test runs from Test_Data into indexed zip
+archives and reads single files back out of them."""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import zipfile
+from datetime import datetime, timedelta
+
+from test_data_reader import ARCHIVE_DIR_NAME, ARCHIVE_INDEX_MEMBER, \
+    TEST_DATA_DIR, list_archives, list_runs
+
+ARCHIVE_COMPRESSION_LEVEL = 9
+
+
+def _archive_path(root, runs):
+    """New, unused archive file name covering the runs' dates"""
+    first, last = runs[0].started, runs[-1].started
+    base = os.path.join(root, ARCHIVE_DIR_NAME,
+                        f"eib_runs_{first:%m-%d-%y}_to_{last:%m-%d-%y}")
+    path, count = f"{base}.zip", 1
+    while os.path.exists(path):
+        count += 1
+        path = f"{base}_{count}.zip"
+    return path
+
+
+def pack_runs(runs, archive_path):
+    """Write the live runs into a new archive with an embedded index and
+    verify it. Returns the index."""
+    index = {}
+    os.makedirs(os.path.dirname(archive_path), exist_ok=True)
+    with zipfile.ZipFile(archive_path, mode='x',
+                         compression=zipfile.ZIP_DEFLATED,
+                         compresslevel=ARCHIVE_COMPRESSION_LEVEL) as archive:
+        for run in runs:
+            members = []
+            for dir_path, _, file_names in sorted(os.walk(run.path)):
+                for file_name in sorted(file_names):
+                    full_path = os.path.join(dir_path, file_name)
+                    rel_path = os.path.relpath(full_path, run.path) \
+                        .replace(os.sep, "/")
+                    archive.write(full_path, f"{run.name}/{rel_path}")
+                    members.append(rel_path)
+            index.setdefault(run.serial, {})[run.started.isoformat()] = \
+                {"name": run.name, "members": members}
+        archive.writestr(ARCHIVE_INDEX_MEMBER,
+                         json.dumps({"format": 1, "runs": index}, indent=1))
+
+    with zipfile.ZipFile(archive_path, mode='r') as archive:
+        bad_member = archive.testzip()
+    if bad_member is not None:
+        raise zipfile.BadZipFile(f"{archive_path}: {bad_member} failed "
+                                 "its CRC check")
+    return index
+
+
+def archived_run_names(root=TEST_DATA_DIR):
+    """Names of every run already packed into an archive under root"""
+    names = set()
+    for archive in list_archives(root):
+        try:
+            with archive:
+                names.update(run.name for run in archive.runs())
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile) as e:
+            print(f"Error reading archive {archive.path}: {e}")
+    return names
+
+
+def archive_old_runs(root=TEST_DATA_DIR, older_than_days=30, remove=False):
+    """Pack live runs older than the cutoff, and not already archived, into
+    a new archive. With remove, delete their directories (and those of old
+    runs packed earlier) once the archive is verified."""
+    cutoff = datetime.now() - timedelta(days=older_than_days)
+    archived = archived_run_names(root)
+    old_runs = [run for run in list_runs(root, include_archived=False)
+                if run.started < cutoff]
+    runs = [run for run in old_runs if run.name not in archived]
+    archive_path = None
+    if runs:
+        archive_path = _archive_path(root, runs)
+        pack_runs(runs, archive_path)
+        print(f"Archived {len(runs)} runs to: {archive_path}")
+    else:
+        print("No runs to archive.")
+
+    if remove:
+        for run in old_runs:
+            shutil.rmtree(run.path)
+        if old_runs:
+            print(f"Removed {len(old_runs)} archived run directories.")
+    return archive_path
+
+
+def find_runs(root, serial=None, started=None):
+    """Runs (live or archived) matching a serial and optional start time"""
+    return [run for run in list_runs(root)
+            if (serial is None or run.serial == serial) and
+            (started is None or run.started == started)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="EIB Test_Data archive")
+    parser.add_argument("--root", default=TEST_DATA_DIR,
+                        help="Test data directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    pack_cmd = commands.add_parser("pack", help="Archive old runs")
+    pack_cmd.add_argument("--older-than", type=float, default=30,
+                          help="Archive runs older than this many days")
+    pack_cmd.add_argument("--remove", action="store_true",
+                          help="Delete run directories once archived")
+
+    list_cmd = commands.add_parser("list", help="List live/archived runs")
+    list_cmd.add_argument("--serial")
+
+    get_cmd = commands.add_parser("get", help="Read one file from a run")
+    get_cmd.add_argument("serial")
+    get_cmd.add_argument("kind", help="Raw data kind (e.g. Voltages) or "
+                                      "'report' for the PDF")
+    get_cmd.add_argument("--started", type=datetime.fromisoformat,
+                         help="Run start time (default: latest run)")
+    get_cmd.add_argument("--out", help="Write to this file")
+    args = parser.parse_args()
+
+    if args.command == "pack":
+        archive_old_runs(args.root, args.older_than, args.remove)
+
+    elif args.command == "list":
+        for found in find_runs(args.root, args.serial):
+            where = found.archive.path if found.archived else "live"
+            print(f"{found.serial:<8} {found.started:%m/%d/%y %H:%M:%S}  "
+                  f"{where}")
+
+    elif args.command == "get":
+        matches = find_runs(args.root, args.serial, args.started)
+        if not matches:
+            sys.exit(f"No run found for S/N {args.serial}")
+        chosen = matches[-1]
+        data = chosen.read_report() if args.kind == "report" \
+            else chosen.read_bytes(f"raw_data/"
+                                   f"{chosen.raw_file_name(args.kind)}")
+        if data is None:
+            sys.exit(f"{chosen.name} has no {args.kind}")
+        if args.out:
+            with open(args.out, mode='wb') as out_file:
+                out_file.write(data)
+            print(f"Saved {args.kind} of {chosen.name} to: {args.out}")
+        else:
+            sys.stdout.buffer.write(data)
@@ -0,0 +1,218 @@
+"""This module finds EIB test runs stored under Test_Data, live or
+archived, and reads their raw data files."""
+
+import csv
+import glob
+import io
+import json
+import os
+import re
+import zipfile
+from datetime import datetime
+
+TEST_DATA_DIR = "Test_Data"
+ARCHIVE_DIR_NAME = "Archive"
+ARCHIVE_INDEX_MEMBER = "index.json"
+RUN_DIR_PATTERN = re.compile(
+    r"^eib_(?P<sn>.+)-(?P<stamp>\d{2}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2})$")
+RUN_DIR_TIME_FORMAT = "%m-%d-%y_%H-%M-%S"
+
+
+def parse_run_dir_name(name):
+    """Return (serial, start datetime) for a run directory name, or None
+    if the name is not a run directory"""
+    match = RUN_DIR_PATTERN.match(name)
+    if match is None:
+        return None
+    try:
+        started = datetime.strptime(match["stamp"], RUN_DIR_TIME_FORMAT)
+    except ValueError:
+        return None
+    return match["sn"], started
+
+
+class TestRun:
+    """One stored EIB test run in a Test_Data directory"""
+    archived = False
+
+    def __init__(self, name, serial, started, path):
+        self.name = name  # Run directory name
+        self.serial = serial
+        self.started = started
+        self.path = path
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.name!r})"
+
+    # *************************************************************************
+    # ******Storage access (overridden for archived runs)******
+    def read_bytes(self, rel_path):
+        """Return a file in the run by its '/'-separated path relative to
+        the run directory, or None if the run lacks it"""
+        try:
+            with open(os.path.join(self.path, *rel_path.split("/")),
+                      mode='rb') as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    def exists(self, rel_path):
+        """True if the run has the file"""
+        return os.path.isfile(os.path.join(self.path, *rel_path.split("/")))
+
+    # *************************************************************************
+    # ******Run files******
+    def raw_file_name(self, kind):
+        """File name of a raw data CSV, e.g. kind="Voltages" """
+        return f"{self.serial}_{kind}.csv"
+
+    def report_file_name(self):
+        """File name of the PDF report"""
+        return f"eib_{self.serial}_Report.pdf"
+
+    def has_raw(self, kind):
+        """True if the run has the given raw data CSV"""
+        return self.exists(f"raw_data/{self.raw_file_name(kind)}")
+
+    def read_raw_text(self, kind):
+        """Return a raw data CSV's text, or None if the run lacks it"""
+        data = self.read_bytes(f"raw_data/{self.raw_file_name(kind)}")
+        return None if data is None else data.decode("utf-8")
+
+    def read_raw_csv(self, kind):
+        """Return a raw data CSV as a list of dicts keyed by its header,
+        or None if the run lacks it"""
+        text = self.read_raw_text(kind)
+        if text is None:
+            return None
+        return list(csv.DictReader(io.StringIO(text, newline='')))
+
+    def read_report(self):
+        """Return the PDF report's bytes, or None if the run lacks it"""
+        return self.read_bytes(self.report_file_name())
+
+    def technician(self):
+        """Return (tester_name, tester_life, station_id). Runs recorded
+        before station IDs were saved report station "unknown"."""
+        rows = self.read_raw_csv("Technician_Data") or [{}]
+        row = rows[0]
+        return row.get("tester_name"), row.get("tester_life"), \
+            row.get("station_id") or "unknown"
+
+    def panel(self):
+        """Return (panel_id, board count) of the multi-up panel the run was
+        tested on. Runs recorded before panels were saved count as a panel
+        of one."""
+        rows = self.read_raw_csv("Technician_Data") or [{}]
+        row = rows[0]
+        try:
+            boards = int(row.get("panel_boards") or 1)
+        except ValueError:
+            boards = 1
+        return row.get("panel_id") or self.name, boards
+
+
+class ArchivedRun(TestRun):
+    """One EIB test run stored inside a Test_Data archive"""
+    archived = True
+
+    def __init__(self, name, serial, started, archive, members):
+        super().__init__(name, serial, started,
+                         f"{archive.path}/{name}")
+        self.archive = archive
+        self.members = set(members)
+
+    def read_bytes(self, rel_path):
+        if rel_path not in self.members:
+            return None
+        return self.archive.read_member(f"{self.name}/{rel_path}")
+
+    def exists(self, rel_path):
+        return rel_path in self.members
+
+
+class RunArchive:
+    """A zip archive of runs with an embedded index keyed by serial and
+    start time. Members are read individually, never unpacked as a whole.
+    The zip stays open from the first read until close() (or the end of a
+    with block), so its central directory is parsed only once."""
+
+    def __init__(self, path):
+        self.path = path
+        self._zip = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _open(self):
+        if self._zip is None:
+            self._zip = zipfile.ZipFile(self.path, mode='r')
+        return self._zip
+
+    def read_member(self, member):
+        """Return one member's bytes"""
+        return self._open().read(member)
+
+    def index(self):
+        """Return the embedded index: {serial: {started_iso: {"name": run
+        directory name, "members": [relative paths]}}}"""
+        return json.loads(self.read_member(ARCHIVE_INDEX_MEMBER))["runs"]
+
+    def runs(self):
+        """Return every run in the archive"""
+        runs = []
+        for serial, by_start in self.index().items():
+            for started, entry in by_start.items():
+                runs.append(ArchivedRun(entry["name"], serial,
+                                        datetime.fromisoformat(started),
+                                        self, entry["members"]))
+        return runs
+
+    def close(self):
+        """Close the underlying zip file"""
+        if self._zip is not None:
+            self._zip.close()
+            self._zip = None
+
+
+def list_archives(root=TEST_DATA_DIR):
+    """Return a RunArchive for every archive under root"""
+    return [RunArchive(path) for path in sorted(
+        glob.glob(os.path.join(root, ARCHIVE_DIR_NAME, "*.zip")))]
+
+
+def list_runs(root=TEST_DATA_DIR, include_archived=True):
+    """Return every run under root, oldest first. A run present both live
+    and in an archive is returned once, from the live directory. Archived
+    runs keep their archive open for fast reads; pass the runs to
+    close_runs() when done with them."""
+    runs = {}
+    if include_archived:
+        for archive in list_archives(root):
+            try:
+                for run in archive.runs():
+                    runs[run.name] = run
+            except (OSError, KeyError, ValueError,
+                    zipfile.BadZipFile) as e:
+                archive.close()
+                print(f"Error reading archive {archive.path}: {e}")
+    try:
+        names = os.listdir(root)
+    except FileNotFoundError:
+        names = []
+    for name in names:
+        parsed = parse_run_dir_name(name)
+        path = os.path.join(root, name)
+        if parsed is not None and os.path.isdir(path):
+            runs[name] = TestRun(name, parsed[0], parsed[1], path)
+    return sorted(runs.values(), key=lambda run: (run.started, run.serial))
+
+
+def close_runs(runs):
+    """Close the archives held open by archived runs from list_runs()"""
+    for run in runs:
+        if run.archived:
+            run.archive.close()
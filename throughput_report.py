@@ -0,0 +1,227 @@
+"""This module reports EIB test station throughput from stored run
+timestamps and, where recorded, per-stage and per-step timings."""
+
+import argparse
+import csv
+from statistics import mean, median
+
+from test_data_reader import TEST_DATA_DIR, close_runs, list_runs
+
+SESSION_GAP_MINUTES = 45  # A longer break between boards ends a session
+
+
+# *************************************************************************
+# ******Statistics helpers******
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1,
+                       round(fraction * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def summarize(values):
+    """Distribution summary of a list of seconds"""
+    if not values:
+        return None
+    return {"n": len(values), "min": min(values), "median": median(values),
+            "mean": mean(values), "p90": percentile(values, 0.9),
+            "max": max(values)}
+
+
+def format_summary(summary):
+    """One-line text form of summarize()"""
+    if summary is None:
+        return "n/a"
+    return (f"n={summary['n']}  min {summary['min']:.0f}s  median "
+            f"{summary['median']:.0f}s  mean {summary['mean']:.0f}s  p90 "
+            f"{summary['p90']:.0f}s  max {summary['max']:.0f}s")
+# *************************************************************************
+
+# *************************************************************************
+# ******Run timing records******
+
+
+def _sum_by(rows, key, start="Start (s)", end="End (s)"):
+    totals = {}
+    for row in rows:
+        try:
+            duration = float(row[end]) - float(row[start])
+        except (KeyError, TypeError, ValueError):
+            continue
+        totals[row[key]] = totals.get(row[key], 0) + duration
+    return totals
+
+
+def load_run_records(runs):
+    """Collect timing information for each test cycle. The runs of one
+    multi-up panel are merged into a single record, since they share the
+    panel's stage and step timings."""
+    records = []
+    panels = {}
+    for run in runs:
+        tester_name, _, station_id = run.technician()
+        panel_id, boards = run.panel()
+        panel_record = panels.get((station_id, panel_id))
+        if panel_record is not None:
+            panel_record["serials"].append(run.serial)
+            panel_record["started"] = min(panel_record["started"],
+                                          run.started)
+            continue
+        stage_rows = run.read_raw_csv("Stage_Timings")
+        step_rows = run.read_raw_csv("Step_Timings")
+        record = {"run": run, "serials": [run.serial],
+                  "started": run.started, "boards": boards,
+                  "technician": tester_name or "unknown",
+                  "station": station_id, "duration_s": None,
+                  "stages": {}, "steps": {}, "cycle_s": None,
+                  "board_cycle_s": None, "idle_s": None}
+        panels[(station_id, panel_id)] = record
+        if stage_rows:
+            record["stages"] = _sum_by(stage_rows, "Stage")
+            try:
+                record["duration_s"] = float(stage_rows[-1]["End (s)"])
+            except (KeyError, ValueError):
+                pass
+        if step_rows:
+            record["steps"] = _sum_by(step_rows, "Step")
+        records.append(record)
+    return records
+
+
+def split_sessions(records, gap_minutes=SESSION_GAP_MINUTES):
+    """Group records into sessions per station. Fills in each record's
+    cycle time (and that time per board) and, when its duration is known,
+    the idle gap before the next cycle."""
+    by_station = {}
+    for record in records:
+        by_station.setdefault(record["station"], []).append(record)
+
+    sessions = []
+    for station, station_records in sorted(by_station.items()):
+        station_records.sort(key=lambda record: record["started"])
+        session = [station_records[0]]
+        for prev, record in zip(station_records, station_records[1:]):
+            between = (record["started"] - prev["started"]).total_seconds()
+            if between > gap_minutes * 60:
+                sessions.append((station, session))
+                session = [record]
+                continue
+            prev["cycle_s"] = between
+            prev["board_cycle_s"] = between / prev["boards"]
+            if prev["duration_s"] is not None:
+                prev["idle_s"] = max(0.0, between - prev["duration_s"])
+            session.append(record)
+        sessions.append((station, session))
+    return sessions
+# *************************************************************************
+
+# *************************************************************************
+# ******Report******
+
+
+def session_report(station, session):
+    """Text report for one session"""
+    first, last = session[0]["started"], session[-1]["started"]
+    timed = [rec for rec in session if rec["cycle_s"] is not None]
+    cycles = [rec["cycle_s"] for rec in timed]
+    board_cycles = [rec["board_cycle_s"] for rec in timed]
+    idles = [rec["idle_s"] for rec in session if rec["idle_s"] is not None]
+    span_h = (last - first).total_seconds() / 3600
+    uph = f"{sum(rec['boards'] for rec in timed) / span_h:.1f}" \
+        if span_h > 0 else "n/a"
+    serials = [serial for rec in session for serial in rec["serials"]]
+    retests = len(serials) - len(set(serials))
+
+    lines = [f"Station {station}: {first:%m/%d/%y %H:%M:%S} - "
+             f"{last:%H:%M:%S}, {len(serials)} runs in {len(session)} "
+             f"cycles ({retests} retests), {uph} units/hour",
+             f"  Cycle time: {format_summary(summarize(cycles))}",
+             f"  Per board:  {format_summary(summarize(board_cycles))}",
+             f"  Idle gaps:  {format_summary(summarize(idles))}"]
+
+    lines += _bottleneck_lines("Stage", [rec["stages"] for rec in session])
+    lines += _bottleneck_lines("Step", [rec["steps"] for rec in session])
+    return lines
+
+
+def _bottleneck_lines(label, per_run):
+    """Mean time per stage/step across the runs that recorded it, slowest
+    first"""
+    per_run = [totals for totals in per_run if totals]
+    if not per_run:
+        return []
+    names = {name for totals in per_run for name in totals}
+    means = {name: mean(totals.get(name, 0) for totals in per_run)
+             for name in names}
+    total = sum(means.values()) or 1
+    lines = [f"  {label} times (mean of {len(per_run)} cycles):"]
+    for name, seconds in sorted(means.items(), key=lambda item: -item[1]):
+        lines.append(f"    {name:<20} {seconds:7.1f}s "
+                     f"{100 * seconds / total:5.1f}%")
+    return lines
+
+
+def technician_report(records):
+    """Per-board cycle-time distribution per technician"""
+    by_tech = {}
+    for record in records:
+        if record["board_cycle_s"] is not None:
+            by_tech.setdefault(record["technician"], []).append(
+                record["board_cycle_s"])
+    lines = ["Cycle time per board, per technician:"]
+    for tech, cycles in sorted(by_tech.items()):
+        lines.append(f"  {tech:<22} {format_summary(summarize(cycles))}")
+    return lines
+
+
+def save_records_csv(records, file_path):
+    """Save one row per cycle (a run, or a multi-up panel) to file"""
+    try:
+        with open(file_path, mode='w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(["Serial", "Started", "Station", "Technician",
+                             "Boards", "Cycle (s)", "Cycle/Board (s)",
+                             "Duration (s)", "Idle (s)"])
+            for rec in records:
+                writer.writerow([" + ".join(rec["serials"]),
+                                 rec["started"].isoformat(), rec["station"],
+                                 rec["technician"], rec["boards"],
+                                 rec["cycle_s"], rec["board_cycle_s"],
+                                 rec["duration_s"], rec["idle_s"]])
+        print(f"Run records saved to: {file_path}")
+
+    except Exception as e:  # pylint: disable=broad-except
+        print(f"Error writing to {file_path}: {e}")
+
+
+def throughput_report(runs, gap_minutes=SESSION_GAP_MINUTES):
+    """Build the full report. Returns (lines, records)."""
+    records = load_run_records(runs)
+    if not records:
+        return ["No test runs found."], records
+    lines = []
+    for station, session in split_sessions(records, gap_minutes):
+        lines += session_report(station, session) + [""]
+    lines += technician_report(records)
+    return lines, records
+# *************************************************************************
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="EIB station throughput")
+    parser.add_argument("--root", default=TEST_DATA_DIR,
+                        help="Test data directory")
+    parser.add_argument("--gap", type=float, default=SESSION_GAP_MINUTES,
+                        help="Minutes between boards that end a session")
+    parser.add_argument("--csv", help="Also save per-cycle records to CSV")
+    args = parser.parse_args()
+
+    stored_runs = list_runs(args.root)
+    report_lines, run_records = throughput_report(stored_runs, args.gap)
+    close_runs(stored_runs)
+    print("\n".join(report_lines))
+    if args.csv:
+        save_records_csv(run_records, args.csv)